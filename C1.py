@@ -1,12 +1,88 @@
-import matplotlib
-matplotlib.use('Agg')  # Prevent GUI backend issues
-import matplotlib.pyplot as plt
+import logging
 import os
+import re
 import json
 from pathlib import Path as FilePath
-from typing import List, Dict, Optional, Union
+from functools import lru_cache
+from operator import attrgetter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+from _render_common import (_arrow_segments, _generate_all, _generate_many, _new_figure, _numpy,
+                            _RenderCache, _replacing, _save_png, _svg_box_size, _svg_text, _unique)
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, the standard library is used without it
+    orjson = None
+
+_log = logging.getLogger(__name__)
+
+
+class User(NamedTuple):
+    """A person or role interacting with the system."""
+    name: str
+    description: Optional[str] = None
+    role: Optional[str] = None
+
+
+class ExternalSystem(NamedTuple):
+    """A system outside the one being modeled."""
+    name: str
+    description: Optional[str] = None
+    protocol: Optional[str] = None
+
+
+class Relationship(NamedTuple):
+    """A labelled connection between two elements."""
+    source: str
+    target: str
+    label: str
+    bidirectional: bool = False
+
+# Pixels per layout unit and per-kind styling for the direct SVG output
+_SVG_SCALE = 100
+_SVG_NODE_STYLES = {
+    # kind: (fill, stroke, stroke width, font size, padding, bold)
+    "system": ('#f0f0f0', 'black', 2, 16, 0.8, True),
+    "user": ('#e0f7fa', 'blue', 1, 12, 0.5, False),
+    "external": ('#e8f5e9', 'green', 1, 12, 0.5, False),
+}
+
+_EDGE_COLORS = {"user": 'blue', "external": 'green'}
+
+# Arrows go over the boxes (text at zorder 3) and under the relationship labels
+_ARROW_ZORDER = 3.5
+_LABEL_ZORDER = 4
+
+# Room around the outermost boxes, in layout units (x, y)
+_AXES_MARGIN = (2.0, 1.5)
+
+
+@lru_cache(maxsize=None)
+def _node_styles() -> Dict[str, Tuple[Dict, Dict]]:
+    """
+    Return the Matplotlib styling per node kind: (font style, box style).
+    
+    Built once, on first use, as it needs Matplotlib; the box styles are
+    BoxStyle instances so the "round,pad=..." spec is parsed only once.
+    """
+    from matplotlib.patches import BoxStyle
+    system_box = BoxStyle("Round", pad=0.8)
+    element_box = BoxStyle("Round", pad=0.5)
+    return {
+        "system": (dict(fontsize=16, fontweight='bold'),
+                   dict(boxstyle=system_box, edgecolor='black', facecolor='#f0f0f0', linewidth=2)),
+        "user": (dict(fontsize=12),
+                 dict(boxstyle=element_box, edgecolor='blue', facecolor='#e0f7fa')),
+        "external": (dict(fontsize=12),
+                     dict(boxstyle=element_box, edgecolor='green', facecolor='#e8f5e9')),
+    }
+
 
 class C4ContextDiagram:
+    # Letters, digits, dots, dashes and underscores only, so no path separators;
+    # compiled and bound once at import
+    _FILENAME_RE = re.compile(r'[A-Za-z0-9._-]{1,128}\Z').match
+
     def __init__(self, system_name: str, output_filename: str = "c4_level1_context"):
         """
         Initialize a C4 Context Diagram generator.
@@ -17,20 +93,36 @@ class C4ContextDiagram:
         """
         self.system_name = system_name
         self.output_filename = output_filename
-        self.users: List[Dict] = []
-        self.external_systems: List[Dict] = []
-        self.relationships: List[Dict] = []
+        self.users: List[User] = []
+        self.external_systems: List[ExternalSystem] = []
+        self.relationships: List[Relationship] = []
+        # Membership sidecars for the lists above, to skip duplicates in O(1)
+        self._user_names: Set[str] = set()
+        self._system_names: Set[str] = set()
+        self._rel_keys: Set[Tuple[str, str, str]] = set()
+        self._rel_index: Optional[Dict[Tuple[str, str], Relationship]] = None
+        self._json_cache: Optional[Tuple[Tuple, str]] = None
+        self._last_render = _RenderCache()
         self._validate_filename(output_filename)
 
+    def _invalidate(self) -> None:
+        """Drop everything derived from the diagram contents after a change."""
+        self._rel_index = None
+        self._json_cache = None
+        self._last_render.clear()
+
     def _validate_filename(self, filename: str) -> None:
         """Validate the output filename to prevent path traversal."""
-        if not filename.isidentifier():
-            raise ValueError("Output filename must be a valid identifier")
+        if not self._FILENAME_RE(filename):
+            raise ValueError("Output filename may only contain letters, digits, '.', '-' and '_' "
+                             "(at most 128 characters)")
 
     def add_user(self, name: str, description: Optional[str] = None, role: Optional[str] = None) -> 'C4ContextDiagram':
         """
         Add a user/persona to the diagram.
         
+        A user whose name is already on the diagram is ignored.
+        
         Args:
             name: Name of the user/role
             description: Optional description of the user
@@ -41,17 +133,19 @@ class C4ContextDiagram:
         """
         if not name:
             raise ValueError("User name cannot be empty")
-        self.users.append({
-            "name": name,
-            "description": description,
-            "role": role
-        })
+        if name in self._user_names:
+            return self
+        self._user_names.add(name)
+        self.users.append(User(name, description, role))
+        self._invalidate()
         return self
 
     def add_external_system(self, name: str, description: Optional[str] = None, protocol: Optional[str] = None) -> 'C4ContextDiagram':
         """
         Add an external system to the diagram.
         
+        An external system whose name is already on the diagram is ignored.
+        
         Args:
             name: Name of the external system
             description: Optional description of the system
@@ -62,17 +156,20 @@ class C4ContextDiagram:
         """
         if not name:
             raise ValueError("External system name cannot be empty")
-        self.external_systems.append({
-            "name": name,
-            "description": description,
-            "protocol": protocol
-        })
+        if name in self._system_names:
+            return self
+        self._system_names.add(name)
+        self.external_systems.append(ExternalSystem(name, description, protocol))
+        self._invalidate()
         return self
 
     def add_relationship(self, source: str, target: str, label: str, bidirectional: bool = False) -> 'C4ContextDiagram':
         """
         Add a relationship between components.
         
+        A relationship with the same source, target and label as an
+        existing one is ignored.
+        
         Args:
             source: Source component name
             target: Target component name
@@ -84,30 +181,32 @@ class C4ContextDiagram:
         """
         if not all([source, target, label]):
             raise ValueError("Source, target and label cannot be empty")
+        if (source, target, label) in self._rel_keys:
+            return self
+        self._rel_keys.add((source, target, label))
             
-        self.relationships.append({
-            "source": source,
-            "target": target,
-            "label": label,
-            "bidirectional": bidirectional
-        })
+        self.relationships.append(Relationship(source, target, label, bidirectional))
+        self._invalidate()
         return self
 
-    def from_json(self, json_data: Union[str, Dict]) -> 'C4ContextDiagram':
+    def from_json(self, json_data: Union[str, bytes, Dict]) -> 'C4ContextDiagram':
         """
         Load diagram configuration from JSON.
         
         Args:
-            json_data: Either a JSON string or a dictionary
+            json_data: Either a JSON string/bytes or a dictionary
             
         Returns:
             self for method chaining
         """
-        if isinstance(json_data, str):
-            json_data = json.loads(json_data)
+        if isinstance(json_data, (str, bytes)):
+            json_data = orjson.loads(json_data) if orjson is not None else json.loads(json_data)
             
         if "system_name" in json_data:
             self.system_name = json_data["system_name"]
+
+        if self._from_json_fast(json_data):
+            return self
             
         if "users" in json_data:
             for user in json_data["users"]:
@@ -135,127 +234,536 @@ class C4ContextDiagram:
                 )
         return self
 
+    def _from_json_fast(self, json_data: Dict) -> bool:
+        """
+        Bulk-load users, external systems and relationships in one pass each.
+        
+        The whole payload is checked against the add_* validation rules
+        first; only if every entry passes are the lists extended with
+        comprehensions instead of one method call per element.
+        
+        Args:
+            json_data: Parsed JSON dictionary
+            
+        Returns:
+            True if the data was loaded, False if the caller must fall back
+            to the element-wise add_* methods
+        """
+        users = json_data.get("users", ())
+        systems = json_data.get("external_systems", ())
+        rels = json_data.get("relationships", ())
+        if not (all(u.get("name") for u in users)
+                and all(s.get("name") for s in systems)
+                and all(r.get("source") and r.get("target") and r.get("label") for r in rels)):
+            return False
+
+        self.users.extend(_unique(
+            [User(u["name"], u.get("description"), u.get("role")) for u in users],
+            self._user_names, attrgetter("name")))
+        self.external_systems.extend(_unique(
+            [ExternalSystem(s["name"], s.get("description"), s.get("protocol")) for s in systems],
+            self._system_names, attrgetter("name")))
+        self.relationships.extend(_unique(
+            [Relationship(r["source"], r["target"], r["label"], r.get("bidirectional", False))
+             for r in rels],
+            self._rel_keys, attrgetter("source", "target", "label")))
+        self._invalidate()
+        return True
+
     def to_json(self, indent: Optional[int] = None) -> str:
         """
         Export diagram configuration to JSON.
         
+        The result is cached under the diagram's state key, so any change
+        to its contents, including direct edits of the public lists, makes
+        the next call build it again.
+        
         Args:
             indent: JSON indentation level (None for compact)
             
         Returns:
             JSON string representation
         """
-        data = {
-            "system_name": self.system_name,
-            "users": self.users,
-            "external_systems": self.external_systems,
-            "relationships": self.relationships
-        }
-        return json.dumps(data, indent=indent)
+        cache_key = (self._state_key(), indent)
+        if self._json_cache is not None and self._json_cache[0] == cache_key:
+            return self._json_cache[1]
 
-    def generate(self, output_format: str = "png", dpi: int = 300) -> str:
+        data = self._as_dict()
+        if orjson is not None and indent in (None, 2):
+            json_str = orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+        else:
+            json_str = json.dumps(data, indent=indent)
+        self._json_cache = (cache_key, json_str)
+        return json_str
+
+    def to_json_file(self, path: Union[str, os.PathLike], indent: Optional[int] = None) -> str:
         """
-        Generate the C4 Level 1 Context Diagram.
+        Export diagram configuration to a JSON file.
+        
+        The JSON is written straight to the file rather than built as a
+        string first: orjson's bytes go out as they are, otherwise
+        json.dump streams into the file.
         
         Args:
-            output_format: Image format ('png', 'jpg', 'svg', 'pdf')
-            dpi: Image resolution in dots per inch
+            path: Destination file
+            indent: JSON indentation level (None for compact)
             
         Returns:
-            Path to the generated diagram file
+            Path of the written file
         """
-        if output_format not in ["png", "jpg", "svg", "pdf"]:
-            raise ValueError(f"Unsupported output format: {output_format}")
-            
-        output_dir = "diagrams_output"
-        FilePath(output_dir).mkdir(exist_ok=True)
+        data = self._as_dict()
+        if orjson is not None and indent in (None, 2):
+            with open(path, 'wb') as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0))
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=indent)
+        return os.fspath(path)
 
-        fig, ax = plt.subplots(figsize=(12, 8))
-        ax.set_facecolor('white')
-        ax.axis('off')
-        ax.set_title(f"Context Diagram: {self.system_name}", fontsize=18, pad=20)
+    def _as_dict(self) -> Dict:
+        """Build the JSON-ready dictionary shared by `to_json` and `to_json_file`."""
+        return {
+            "system_name": self.system_name,
+            "users": [user._asdict() for user in self.users],
+            "external_systems": [system._asdict() for system in self.external_systems],
+            "relationships": [rel._asdict() for rel in self.relationships]
+        }
+
+    def _layout(self) -> Tuple[List[Tuple], List[Tuple], List[Tuple]]:
+        """
+        Compute where every box, arrow and label of the diagram goes.
+        
+        Shared by the Matplotlib and the SVG renderers so both produce
+        the same arrangement.
+        
+        Returns:
+            Tuple of (nodes, edges, labels) where nodes are (x, y, text, kind),
+            edges are (start, end, kind, bidirectional) and labels are (x, y, text)
+        """
+        _log.debug("state users=%d ext=%d rels=%d",
+                   len(self.users), len(self.external_systems), len(self.relationships))
 
         # Calculate positions dynamically based on number of elements
         max_elements = max(len(self.users), len(self.external_systems), 1)
         vertical_spacing = 10 / max(1, max_elements)
 
-        # Main system properties
-        system_box_style = dict(boxstyle="round,pad=0.8", edgecolor='black', facecolor='#f0f0f0', linewidth=2)
-        system_font_style = dict(fontsize=16, ha='center', va='center', fontweight='bold')
+        nodes = [(0, 0, self.system_name, "system")]
+        edges = []
+        labels = []
 
-        # Draw main system in the center
-        ax.text(0, 0, self.system_name, **system_font_style, bbox=system_box_style)
+        # Box, arrow-end and label heights of each column, in one array pass
+        # per column: rows are (box, arrow end, label)
+        np = _numpy()
+        scales = np.array([[1.0], [0.2], [0.6]])
+        user_y = (scales * ((np.arange(len(self.users)) - len(self.users)/2) * vertical_spacing)).T
+        system_y = (scales * ((np.arange(len(self.external_systems)) - len(self.external_systems)/2)
+                              * vertical_spacing)).T
+
+        # Users on the left
+        for user, (y_offset, y_end, y_label) in zip(self.users, user_y.tolist()):
+            user_label = f"{user.name}\n({user.role})" if user.role else user.name
+            nodes.append((-5, y_offset, user_label, "user"))
+            edges.append(((-4, y_offset), (-1.5, y_end), "user", False))
 
-        # Draw users on the left
-        for idx, user in enumerate(self.users):
-            y_offset = (idx - len(self.users)/2) * vertical_spacing
-            user_label = f"{user['name']}\n({user['role']})" if user.get('role') else user['name']
-            
-            ax.text(-5, y_offset, user_label, fontsize=12, ha='center', va='center',
-                   bbox=dict(boxstyle="round,pad=0.5", edgecolor='blue', facecolor='#e0f7fa'))
-            
-            # Draw relationship arrow
-            arrow_style = dict(arrowstyle="->", color='blue', linewidth=1.5)
-            ax.annotate("", xy=(-1.5, y_offset*0.2), xytext=(-4, y_offset),
-                        arrowprops=arrow_style)
-            
             # Add relationship label if exists
-            rel_label = self._find_relationship_label(user['name'], self.system_name)
+            rel_label = self._find_relationship_label(user.name, self.system_name)
             if rel_label:
-                ax.text(-2.5, y_offset*0.6, rel_label, fontsize=10, ha='center', va='center')
-
-        # Draw external systems on the right
-        for idx, system in enumerate(self.external_systems):
-            y_offset = (idx - len(self.external_systems)/2) * vertical_spacing
-            system_label = f"{system['name']}"
-            if system.get('protocol'):
-                system_label += f"\n({system['protocol']})"
-                
-            ax.text(5, y_offset, system_label, fontsize=12, ha='center', va='center',
-                   bbox=dict(boxstyle="round,pad=0.5", edgecolor='green', facecolor='#e8f5e9'))
-            
-            # Draw relationship arrow
-            arrow_style = dict(arrowstyle="->", color='green', linewidth=1.5)
+                labels.append((-2.5, y_label, rel_label))
+
+        # External systems on the right
+        for system, (y_offset, y_end, y_label) in zip(self.external_systems, system_y.tolist()):
+            system_label = f"{system.name}"
+            if system.protocol:
+                system_label += f"\n({system.protocol})"
+            nodes.append((5, y_offset, system_label, "external"))
+
             direction = 1  # Default direction (system -> external)
-            
+            bidirectional = False
+
             # Find relationship to determine direction
-            rel = self._find_relationship(self.system_name, system['name'])
-            if rel and rel.get('bidirectional'):
-                arrow_style['arrowstyle'] = "<->"
-            elif rel and rel['source'] == system['name']:
+            rel = self._find_relationship(self.system_name, system.name)
+            if rel and rel.bidirectional:
+                bidirectional = True
+            elif rel and rel.source == system.name:
                 direction = -1  # Reverse direction (external -> system)
-            
-            ax.annotate("", xy=(1.5*direction, y_offset*0.2), xytext=(4*direction, y_offset),
-                        arrowprops=arrow_style)
-            
+
+            edges.append(((4*direction, y_offset), (1.5*direction, y_end),
+                          "external", bidirectional))
+
             # Add relationship label if exists
             if rel:
-                ax.text(2.5*direction, y_offset*0.6, rel['label'], fontsize=10, ha='center', va='center')
+                labels.append((2.5*direction, y_label, rel.label))
+
+        return nodes, edges, labels
+
+    def _build_figure(self):
+        """
+        Build the figure for the Context Diagram without saving it.
+        
+        The figure does not depend on the output format, so it can be
+        exported several times with `_render` before being closed.
+        
+        Returns:
+            Tuple of (figure, axes)
+        """
+        renderer = DiagramRenderer()
+        renderer.draw(self)
+        return renderer.fig, renderer.ax
+
+    def _emit_svg(self, output_path: str) -> str:
+        """
+        Write the diagram as SVG markup directly, without Matplotlib.
+        
+        Boxes are sized from the label text, so the result matches the
+        Matplotlib rendering in layout but not pixel for pixel.
+        
+        Args:
+            output_path: Destination .svg file
+            
+        Returns:
+            Path to the generated diagram file
+        """
+        nodes, edges, labels = self._layout()
+        body = []
+        bounds = []
+
+        for start, end, kind, bidirectional in edges:
+            x1, y1 = start[0] * _SVG_SCALE, -start[1] * _SVG_SCALE
+            x2, y2 = end[0] * _SVG_SCALE, -end[1] * _SVG_SCALE
+            marker = f"url(#arrow-{kind})"
+            start_marker = f' marker-start="{marker}"' if bidirectional else ''
+            body.append(f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}" '
+                        f'stroke="{_EDGE_COLORS[kind]}" stroke-width="1.5"'
+                        f'{start_marker} marker-end="{marker}"/>')
 
-        # Save diagram
-        output_path = os.path.join(output_dir, f"{self.output_filename}.{output_format}")
-        plt.savefig(output_path, dpi=dpi, bbox_inches='tight', format=output_format)
-        plt.close()
+        for x, y, text, kind in nodes:
+            fill, stroke, stroke_width, font_size, pad, bold = _SVG_NODE_STYLES[kind]
+            lines = text.split("\n")
+            width, height = _svg_box_size(lines, font_size, pad)
+            cx, cy = x * _SVG_SCALE, -y * _SVG_SCALE
+            left, top = cx - width / 2, cy - height / 2
+            bounds.append((left, top, left + width, top + height))
+            body.append(f'<rect x="{left:.1f}" y="{top:.1f}" width="{width:.1f}" height="{height:.1f}" '
+                        f'rx="8" fill="{fill}" stroke="{stroke}" stroke-width="{stroke_width}"/>')
+            body.append(_svg_text(cx, cy, lines, font_size, bold))
 
-        print(f"Diagram generated at {output_path}")
+        for x, y, text in labels:
+            body.append(_svg_text(x * _SVG_SCALE, -y * _SVG_SCALE, [text], 10))
+
+        left = min(b[0] for b in bounds) - 20
+        top = min(b[1] for b in bounds) - 60
+        right = max(b[2] for b in bounds) + 20
+        bottom = max(b[3] for b in bounds) + 20
+        title = _svg_text((left + right) / 2, top + 30, [f"Context Diagram: {self.system_name}"], 18)
+
+        markers = ''.join(
+            f'<marker id="arrow-{kind}" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="8" '
+            f'markerHeight="8" orient="auto-start-reverse"><path d="M0,0 L10,5 L0,10" fill="none" '
+            f'stroke="{color}" stroke-width="1.5"/></marker>'
+            for kind, color in _EDGE_COLORS.items())
+        svg = (f'<svg xmlns="http://www.w3.org/2000/svg" '
+               f'viewBox="{left:.1f} {top:.1f} {right - left:.1f} {bottom - top:.1f}" '
+               f'width="{right - left:.0f}" height="{bottom - top:.0f}" font-family="sans-serif">'
+               f'<defs>{markers}</defs><rect x="{left:.1f}" y="{top:.1f}" width="100%" height="100%" fill="white"/>'
+               f'{title}{"".join(body)}</svg>')
+        with _replacing(output_path) as tmp_path:
+            FilePath(tmp_path).write_text(svg, encoding="utf-8")
+
+        _log.info("Diagram generated at %s", output_path)
         return output_path
 
-    def _find_relationship(self, source: str, target: str) -> Optional[Dict]:
+    def _output_path(self, output_format: str) -> str:
+        """Return the output file path for a format, creating the output directory."""
+        output_dir = "diagrams_output"
+        FilePath(output_dir).mkdir(exist_ok=True)
+        return os.path.join(output_dir, f"{self.output_filename}.{output_format}")
+
+    def _render(self, fig, output_format: str = "png", dpi: int = 150,
+                optimize: bool = False, compress_level: int = 1) -> str:
+        """
+        Save an already built figure in the given format.
+        
+        Args:
+            fig: Figure returned by `_build_figure`
+            output_format: Image format ('png', 'jpg', 'svg', 'pdf')
+            dpi: Image resolution in dots per inch
+            optimize: Spend extra time compressing PNG output to shrink the file
+            compress_level: zlib level 0-9 for PNG output when not optimizing
+            
+        Returns:
+            Path to the generated diagram file
+        """
+        if output_format not in ["png", "jpg", "svg", "pdf"]:
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+        output_path = self._output_path(output_format)
+        if output_format == "svg":
+            return self._emit_svg(output_path)
+
+        with _replacing(output_path) as tmp_path:
+            if output_format != "png" or not _save_png(fig, tmp_path, dpi, optimize=optimize,
+                                                        compress_level=compress_level):
+                extra = {}
+                if output_format == "png":
+                    extra["pil_kwargs"] = {"optimize": True} if optimize else {"compress_level": compress_level}
+                fig.savefig(tmp_path, dpi=dpi, bbox_inches='tight', format=output_format, **extra)
+
+        _log.info("Diagram generated at %s", output_path)
+        return output_path
+
+    def generate(self, output_format: str = "png", dpi: int = 150,
+                 high_res: bool = False, optimize: bool = False,
+                 compress_level: int = 1) -> str:
+        """
+        Generate the C4 Level 1 Context Diagram.
+        
+        Calling it again for an unchanged diagram returns the file
+        written last time, as long as it is still there untouched.
+        
+        Args:
+            output_format: Image format ('png', 'jpg', 'svg', 'pdf')
+            dpi: Image resolution in dots per inch; 150 is plenty on screen
+            high_res: Render at 300 dpi instead, e.g. for print
+            optimize: Spend extra time compressing PNG output to shrink the file
+            compress_level: zlib level 0-9 for PNG output; 1 trades a slightly
+                larger file for much faster encoding
+            
+        Returns:
+            Path to the generated diagram file
+        """
+        if output_format not in ["png", "jpg", "svg", "pdf"]:
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+        if high_res:
+            dpi = 300
+
+        # Nothing changed since this output was written: reuse the file
+        render_key = (self._state_key(), output_format, dpi, optimize, compress_level)
+        cached = self._last_render.get(render_key)
+        if cached is not None:
+            return cached
+
+        # SVG is written directly and never needs a figure
+        if output_format == "svg":
+            output_path = self._emit_svg(self._output_path(output_format))
+        else:
+            fig, _ = self._build_figure()
+            output_path = self._render(fig, output_format, dpi, optimize, compress_level)
+
+        return self._last_render.put(render_key, output_path)
+
+    def _state_key(self) -> int:
+        """Hash everything the rendered output depends on."""
+        return hash((self.system_name, self.output_filename, tuple(self.users),
+                     tuple(self.external_systems), tuple(self.relationships)))
+
+    def generate_all(self, output_formats: Sequence[str] = ("png", "svg", "pdf"),
+                     dpi: int = 150) -> List[str]:
+        """
+        Generate the diagram in several formats, one worker process per format.
+        
+        Args:
+            output_formats: Image formats to generate
+            dpi: Image resolution in dots per inch
+            
+        Returns:
+            Paths to the generated diagram files, in the order of `output_formats`
+        """
+        return _generate_all(self, output_formats, dpi)
+
+    @classmethod
+    def generate_many(cls, specs: Iterable[Union[str, bytes, Dict]], output_format: str = "png",
+                      dpi: int = 150, max_workers: Optional[int] = None) -> List[str]:
+        """
+        Generate many Context Diagrams from JSON specs, spread over worker processes.
+        
+        Every diagram is drawn independently, so they render in parallel.
+        Each spec must write its own file: specs that would share an output
+        path, e.g. two without "output_filename", raise ValueError before
+        anything is drawn.
+        
+        Args:
+            specs: JSON strings or dictionaries, as accepted by `from_json`
+            output_format: Image format ('png', 'jpg', 'svg', 'pdf')
+            dpi: Image resolution in dots per inch
+            max_workers: Number of worker processes (default: one per CPU)
+            
+        Returns:
+            Paths to the generated diagram files, in the order of `specs`
+        """
+        return _generate_many(cls, specs, output_format, dpi, max_workers, "Unnamed System")
+
+    @classmethod
+    def save_pdf_book(cls, diagrams: Iterable['C4ContextDiagram'],
+                      path: Union[str, os.PathLike]) -> str:
+        """
+        Save several Context Diagrams as the pages of a single PDF file.
+        
+        All pages are drawn on one reused figure and written through one
+        PdfPages file, instead of a figure and a PDF file per diagram.
+        
+        Args:
+            diagrams: The diagrams to include, one page each
+            path: Destination PDF file
+            
+        Returns:
+            Path of the written file
+        """
+        from matplotlib.backends.backend_pdf import PdfPages
+
+        with DiagramRenderer() as renderer, PdfPages(path) as pdf:
+            for diagram in diagrams:
+                renderer.draw(diagram)
+                pdf.savefig(renderer.fig, bbox_inches='tight')
+        _log.info("PDF book generated at %s", path)
+        return os.fspath(path)
+
+    def _relationship_index(self) -> Dict[Tuple[str, str], Relationship]:
+        """Map (source, target) pairs to relationships, built once until the next change."""
+        if self._rel_index is None:
+            index = {}
+            for rel in self.relationships:
+                index.setdefault((rel.source, rel.target), rel)
+                if rel.bidirectional:
+                    index.setdefault((rel.target, rel.source), rel)
+            self._rel_index = index
+        return self._rel_index
+
+    def _find_relationship(self, source: str, target: str) -> Optional[Relationship]:
         """Find a relationship between two components."""
-        for rel in self.relationships:
-            if rel['source'] == source and rel['target'] == target:
-                return rel
-            if rel.get('bidirectional') and rel['source'] == target and rel['target'] == source:
-                return rel
-        return None
+        return self._relationship_index().get((source, target))
 
     def _find_relationship_label(self, source: str, target: str) -> Optional[str]:
         """Find the label of a relationship between two components."""
         rel = self._find_relationship(source, target)
-        return rel['label'] if rel else None
+        return rel.label if rel else None
+
+
+class DiagramRenderer:
+    """
+    Render Context Diagrams through one reusable Figure/Axes.
+    
+    Boxes, arrows and labels are created the first time they are needed
+    and afterwards only moved and relabelled, so rendering many diagrams
+    in a row does not rebuild the figure and its artists every time.
+    """
+
+    def __init__(self, figsize: Tuple[float, float] = (12, 8)):
+        """
+        Initialize the renderer and its figure.
+        
+        Args:
+            figsize: Figure size in inches
+        """
+        from matplotlib.collections import LineCollection
+
+        self.fig = _new_figure(figsize)
+        self.ax = self.fig.add_subplot(frameon=False)
+        self.ax.set_axis_off()
+        self._title = self.ax.set_title("", fontsize=18, pad=20)
+        self._node_texts: Dict[str, List] = {kind: [] for kind in _node_styles()}
+        # One collection per edge colour holds every arrow of that kind; the
+        # layout reaches past the axes limits, so they must not be clipped
+        # or move the limits. They are drawn over the node boxes
+        self._edges = {kind: self.ax.add_collection(
+                           LineCollection([], colors=color, linewidths=1.5, clip_on=False,
+                                          zorder=_ARROW_ZORDER),
+                           autolim=False)
+                       for kind, color in _EDGE_COLORS.items()}
+        self._label_texts: List = []
+        self._closed = False
+
+    def __enter__(self) -> 'DiagramRenderer':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @staticmethod
+    def _take(pool: List, count: int, create) -> List:
+        """Grow an artist pool to `count`, hide what is left over and return the rest."""
+        while len(pool) < count:
+            pool.append(create())
+        for idx, artist in enumerate(pool):
+            artist.set_visible(idx < count)
+        return pool[:count]
+
+    def draw(self, diagram: 'C4ContextDiagram') -> None:
+        """
+        Draw a diagram onto the shared figure, reusing existing artists.
+        
+        Args:
+            diagram: The Context Diagram to draw
+        """
+        if self._closed:
+            raise RuntimeError("DiagramRenderer is closed")
+
+        nodes, edges, labels = diagram._layout()
+        self._title.set_text(f"Context Diagram: {diagram.system_name}")
+
+        # Fit the limits to the layout so the drawing lands on the figure;
+        # the arrows are laid out through transData, so this comes first
+        ys = [y for _, y, _, _ in nodes]
+        self.ax.set_xlim(-5 - _AXES_MARGIN[0], 5 + _AXES_MARGIN[0])
+        self.ax.set_ylim(min(ys) - _AXES_MARGIN[1], max(ys) + _AXES_MARGIN[1])
+
+        for kind, (font_style, box_style) in _node_styles().items():
+            kind_nodes = [node for node in nodes if node[3] == kind]
+            texts = self._take(self._node_texts[kind], len(kind_nodes),
+                               lambda: self.ax.text(0, 0, "", ha='center', va='center',
+                                                    bbox=box_style, **font_style))
+            for text, (x, y, label, _) in zip(texts, kind_nodes):
+                text.set_position((x, y))
+                text.set_text(label)
+
+        for kind, collection in self._edges.items():
+            collection.set_segments([
+                segment
+                for start, end, edge_kind, bidirectional in edges if edge_kind == kind
+                for segment in _arrow_segments(self.ax.transData, start, end,
+                                               both=bidirectional, dpi=self.fig.dpi)
+            ])
+
+        texts = self._take(self._label_texts, len(labels),
+                           lambda: self.ax.text(0, 0, "", fontsize=10, ha='center', va='center',
+                                                zorder=_LABEL_ZORDER))
+        for text, (x, y, label) in zip(texts, labels):
+            text.set_position((x, y))
+            text.set_text(label)
+
+    def render(self, diagram: 'C4ContextDiagram', output_format: str = "png", dpi: int = 150) -> str:
+        """
+        Draw a diagram and save it in the given format.
+        
+        Args:
+            diagram: The Context Diagram to render
+            output_format: Image format ('png', 'jpg', 'svg', 'pdf')
+            dpi: Image resolution in dots per inch
+            
+        Returns:
+            Path to the generated diagram file
+        """
+        self.draw(diagram)
+        return diagram._render(self.fig, output_format, dpi)
+
+    def close(self) -> None:
+        """
+        Release the figure and its artists once the batch is done.
+        
+        The renderer cannot be used afterwards: draw() and render() raise
+        RuntimeError instead of drawing onto the emptied figure.
+        """
+        self._closed = True
+        self.fig.clear()
+        for texts in self._node_texts.values():
+            texts.clear()
+        self._edges.clear()
+        self._label_texts.clear()
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     # Example usage
     diagram = C4ContextDiagram("Enterprise Solution Architecture Platform")
     
@@ -273,10 +781,6 @@ if __name__ == "__main__":
     diagram.add_relationship("Enterprise Solution Architecture Platform", "Oracle Financials", "Gets financial data")
     diagram.add_relationship("Enterprise Solution Architecture Platform", "LDAP Server", "Authenticates users", bidirectional=True)
     
-    # Generate diagram in multiple formats
-    diagram.generate(output_format="png")
-    diagram.generate(output_format="svg")
-    
     # Export/import JSON
     json_data = diagram.to_json(indent=2)
     print("\nDiagram JSON representation:")
@@ -284,7 +788,12 @@ if __name__ == "__main__":
     
     # Create new diagram from JSON
     new_diagram = C4ContextDiagram("Temp System").from_json(json_data)
-    new_diagram.generate(output_format="pdf")
+    
+    # Render both diagrams through one reusable figure
+    with DiagramRenderer() as renderer:
+        for fmt in ("png", "svg"):
+            renderer.render(diagram, fmt)
+        renderer.render(new_diagram, "pdf")
 
 
 
@@ -1,13 +1,94 @@
-import matplotlib
-matplotlib.use('Agg')  # Ensure no GUI errors
-import matplotlib.pyplot as plt
-import numpy as np
+import logging
 import os
+import re
 import json
 from pathlib import Path as FilePath
-from typing import List, Dict, Optional, Union, Tuple
+from functools import lru_cache
+from operator import attrgetter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Union, Tuple
+from _render_common import (_arrow_segments, _generate_all, _generate_many, _new_figure, _numpy,
+                            _RenderCache, _replacing, _save_png, _svg_box_size, _svg_shrink,
+                            _svg_text, _unique)
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, the standard library is used without it
+    orjson = None
+
+_log = logging.getLogger(__name__)
+
+
+class Container(NamedTuple):
+    """A separately deployable unit of the system."""
+    name: str
+    technology: str
+    description: Optional[str] = None
+    type: str = "Application"
+    db_schema: Optional[str] = None
+
+
+class Relationship(NamedTuple):
+    """A labelled connection between two containers."""
+    source: str
+    target: str
+    label: str
+    protocol: Optional[str] = None
+    bidirectional: bool = False
+
+# Pixels per layout unit for the direct SVG output
+_SVG_SCALE = 100
+
+# Arrows go over the boxes (text at zorder 3) and under the relationship labels
+_ARROW_ZORDER = 3.5
+_LABEL_ZORDER = 4
+
+# Room around the outermost boxes, in layout units
+_AXES_MARGIN = 2.5
+
+# Background / border colours per container type
+_CONTAINER_COLORS = {
+    "Application": ('#e3f2fd', '#1565c0'),  # Light blue / Dark blue
+    "Database": ('#e8f5e9', '#2e7d32'),    # Light green / Dark green
+    "Queue": ('#fff3e0', '#ef6c00'),       # Light orange / Dark orange
+    "Browser": ('#f3e5f5', '#7b1fa2'),     # Light purple / Dark purple
+    "Mobile": ('#e0f7fa', '#00838f'),      # Light teal / Dark teal
+    "API": ('#ffebee', '#c62828')          # Light red / Dark red
+}
+_DEFAULT_CONTAINER_COLORS = ('#f5f5f5', '#424242')  # Default gray
+
+
+@lru_cache(maxsize=None)
+def _box_styles() -> Tuple[Dict, Dict[str, Dict], Dict, Dict]:
+    """
+    Return the text box styles shared by every artist.
+    
+    Built once, on first use, as it needs Matplotlib; the box styles are
+    BoxStyle instances so the "round,pad=..." spec is parsed only once.
+    
+    Returns:
+        Tuple of (system box, container boxes per type, default container
+        box, relationship label box)
+    """
+    from matplotlib.patches import BoxStyle
+    container_box = BoxStyle("Round", pad=0.6)
+    system_bbox = dict(boxstyle=BoxStyle("Round", pad=1.2), edgecolor='black',
+                       facecolor='#bbdefb', linewidth=2)
+    container_bboxes = {
+        container_type: dict(boxstyle=container_box, edgecolor=border_color,
+                             facecolor=bg_color, linewidth=1.5)
+        for container_type, (bg_color, border_color) in _CONTAINER_COLORS.items()
+    }
+    default_container_bbox = dict(boxstyle=container_box, edgecolor=_DEFAULT_CONTAINER_COLORS[1],
+                                  facecolor=_DEFAULT_CONTAINER_COLORS[0], linewidth=1.5)
+    label_bbox = dict(boxstyle=BoxStyle("Round", pad=0.2), facecolor='white', alpha=0.8)
+    return system_bbox, container_bboxes, default_container_bbox, label_bbox
+
 
 class C4ContainerDiagram:
+    # Letters, digits, dots, dashes and underscores only, so no path separators;
+    # compiled and bound once at import
+    _FILENAME_RE = re.compile(r'[A-Za-z0-9._-]{1,128}\Z').match
+
     def __init__(self, system_name: str, output_filename: str = "c4_level2_container"):
         """
         Initialize a C4 Container Diagram generator.
@@ -18,14 +99,25 @@ class C4ContainerDiagram:
         """
         self.system_name = system_name
         self.output_filename = output_filename
-        self.containers: List[Dict] = []
-        self.relationships: List[Dict] = []
+        self.containers: List[Container] = []
+        self.relationships: List[Relationship] = []
+        # Membership sidecars for the lists above, to skip duplicates in O(1)
+        self._container_names: Set[str] = set()
+        self._rel_keys: Set[Tuple[str, str, str]] = set()
+        self._json_cache: Optional[Tuple[Tuple, str]] = None
+        self._last_render = _RenderCache()
         self._validate_filename(output_filename)
 
+    def _invalidate(self) -> None:
+        """Drop everything derived from the diagram contents after a change."""
+        self._json_cache = None
+        self._last_render.clear()
+
     def _validate_filename(self, filename: str) -> None:
         """Validate the output filename to prevent path traversal."""
-        if not filename.isidentifier():
-            raise ValueError("Output filename must be a valid identifier")
+        if not self._FILENAME_RE(filename):
+            raise ValueError("Output filename may only contain letters, digits, '.', '-' and '_' "
+                             "(at most 128 characters)")
 
     def add_container(self, name: str, technology: str, 
                      description: Optional[str] = None, 
@@ -34,6 +126,8 @@ class C4ContainerDiagram:
         """
         Add a container to the diagram.
         
+        A container whose name is already on the diagram is ignored.
+        
         Args:
             name: Name of the container
             technology: Technology stack used
@@ -46,14 +140,12 @@ class C4ContainerDiagram:
         """
         if not name or not technology:
             raise ValueError("Container name and technology cannot be empty")
+        if name in self._container_names:
+            return self
+        self._container_names.add(name)
             
-        self.containers.append({
-            "name": name,
-            "technology": technology,
-            "description": description,
-            "type": container_type,
-            "db_schema": db_schema
-        })
+        self.containers.append(Container(name, technology, description, container_type, db_schema))
+        self._invalidate()
         return self
 
     def add_relationship(self, source: str, target: str, label: str,
@@ -62,6 +154,9 @@ class C4ContainerDiagram:
         """
         Add a relationship between containers.
         
+        A relationship with the same source, target and label as an
+        existing one is ignored.
+        
         Args:
             source: Source container name
             target: Target container name
@@ -74,31 +169,32 @@ class C4ContainerDiagram:
         """
         if not all([source, target, label]):
             raise ValueError("Source, target and label cannot be empty")
+        if (source, target, label) in self._rel_keys:
+            return self
+        self._rel_keys.add((source, target, label))
             
-        self.relationships.append({
-            "source": source,
-            "target": target,
-            "label": label,
-            "protocol": protocol,
-            "bidirectional": bidirectional
-        })
+        self.relationships.append(Relationship(source, target, label, protocol, bidirectional))
+        self._invalidate()
         return self
 
-    def from_json(self, json_data: Union[str, Dict]) -> 'C4ContainerDiagram':
+    def from_json(self, json_data: Union[str, bytes, Dict]) -> 'C4ContainerDiagram':
         """
         Load diagram configuration from JSON.
         
         Args:
-            json_data: Either a JSON string or a dictionary
+            json_data: Either a JSON string/bytes or a dictionary
             
         Returns:
             self for method chaining
         """
-        if isinstance(json_data, str):
-            json_data = json.loads(json_data)
+        if isinstance(json_data, (str, bytes)):
+            json_data = orjson.loads(json_data) if orjson is not None else json.loads(json_data)
             
         if "system_name" in json_data:
             self.system_name = json_data["system_name"]
+
+        if self._from_json_fast(json_data):
+            return self
             
         if "containers" in json_data:
             for container in json_data["containers"]:
@@ -121,97 +217,169 @@ class C4ContainerDiagram:
                 )
         return self
 
+    def _from_json_fast(self, json_data: Dict) -> bool:
+        """
+        Bulk-load containers and relationships in one pass each.
+        
+        The whole payload is checked against the add_* validation rules
+        first; only if every entry passes are the lists extended with
+        comprehensions instead of one method call per element.
+        
+        Args:
+            json_data: Parsed JSON dictionary
+            
+        Returns:
+            True if the data was loaded, False if the caller must fall back
+            to the element-wise add_* methods
+        """
+        containers = json_data.get("containers", ())
+        rels = json_data.get("relationships", ())
+        if not (all(c.get("name") and c.get("technology") for c in containers)
+                and all(r.get("source") and r.get("target") and r.get("label") for r in rels)):
+            return False
+
+        self.containers.extend(_unique(
+            [Container(c["name"], c["technology"], c.get("description"),
+                       c.get("type", "Application"), c.get("db_schema"))
+             for c in containers],
+            self._container_names, attrgetter("name")))
+        self.relationships.extend(_unique(
+            [Relationship(r["source"], r["target"], r["label"], r.get("protocol"),
+                          r.get("bidirectional", False))
+             for r in rels],
+            self._rel_keys, attrgetter("source", "target", "label")))
+        self._invalidate()
+        return True
+
     def to_json(self, indent: Optional[int] = None) -> str:
         """
         Export diagram configuration to JSON.
         
+        The result is cached under the diagram's state key, so any change
+        to its contents, including direct edits of the public lists, makes
+        the next call build it again.
+        
         Args:
             indent: JSON indentation level (None for compact)
             
         Returns:
             JSON string representation
         """
-        data = {
+        cache_key = (self._state_key(), indent)
+        if self._json_cache is not None and self._json_cache[0] == cache_key:
+            return self._json_cache[1]
+
+        data = self._as_dict()
+        if orjson is not None and indent in (None, 2):
+            json_str = orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+        else:
+            json_str = json.dumps(data, indent=indent)
+        self._json_cache = (cache_key, json_str)
+        return json_str
+
+    def to_json_file(self, path: Union[str, os.PathLike], indent: Optional[int] = None) -> str:
+        """
+        Export diagram configuration to a JSON file.
+        
+        The JSON is written straight to the file rather than built as a
+        string first: orjson's bytes go out as they are, otherwise
+        json.dump streams into the file.
+        
+        Args:
+            path: Destination file
+            indent: JSON indentation level (None for compact)
+            
+        Returns:
+            Path of the written file
+        """
+        data = self._as_dict()
+        if orjson is not None and indent in (None, 2):
+            with open(path, 'wb') as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0))
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=indent)
+        return os.fspath(path)
+
+    def _as_dict(self) -> Dict:
+        """Build the JSON-ready dictionary shared by `to_json` and `to_json_file`."""
+        return {
             "system_name": self.system_name,
-            "containers": self.containers,
-            "relationships": self.relationships
+            "containers": [container._asdict() for container in self.containers],
+            "relationships": [rel._asdict() for rel in self.relationships]
         }
-        return json.dumps(data, indent=indent)
 
     def _get_container_color(self, container_type: str) -> Tuple[str, str]:
         """Get color scheme based on container type."""
-        colors = {
-            "Application": ('#e3f2fd', '#1565c0'),  # Light blue / Dark blue
-            "Database": ('#e8f5e9', '#2e7d32'),    # Light green / Dark green
-            "Queue": ('#fff3e0', '#ef6c00'),       # Light orange / Dark orange
-            "Browser": ('#f3e5f5', '#7b1fa2'),     # Light purple / Dark purple
-            "Mobile": ('#e0f7fa', '#00838f'),      # Light teal / Dark teal
-            "API": ('#ffebee', '#c62828')          # Light red / Dark red
-        }
-        return colors.get(container_type, ('#f5f5f5', '#424242'))  # Default gray
+        return _CONTAINER_COLORS.get(container_type, _DEFAULT_CONTAINER_COLORS)
+
+    def _container_label(self, container: Container) -> str:
+        """Build the multi-line box label of a container."""
+        parts = [container.name, f"[{container.technology}]"]
+        if container.description:
+            parts.append(container.description)
+        if container.db_schema:
+            parts.append(f"Schema: {container.db_schema}")
+        return "\n".join(parts)
+
+    def _relationship_label(self, rel: Relationship) -> str:
+        """Build the label of a relationship, with its protocol if specified."""
+        return f"{rel.label} ({rel.protocol})" if rel.protocol else rel.label
 
-    def generate(self, output_format: str = "png", dpi: int = 300) -> str:
+    def _build_figure(self):
         """
-        Generate the C4 Level 2 Container Diagram.
+        Build the figure for the Container Diagram without saving it.
+        
+        The figure does not depend on the output format, so it can be
+        exported several times with `_render` before being closed.
         
-        Args:
-            output_format: Image format ('png', 'jpg', 'svg', 'pdf')
-            dpi: Image resolution in dots per inch
-            
         Returns:
-            Path to the generated diagram file
+            Tuple of (figure, axes)
         """
-        if output_format not in ["png", "jpg", "svg", "pdf"]:
-            raise ValueError(f"Unsupported output format: {output_format}")
-            
         if not self.containers:
             raise ValueError("No containers added to diagram")
 
-        output_dir = "diagrams_output"
-        FilePath(output_dir).mkdir(exist_ok=True)
+        # One or two containers sit on a single row, so the ring's height is not needed
+        figsize = (14, 10) if len(self.containers) > 2 else (14, 6)
+        from matplotlib.collections import LineCollection
+        system_bbox, container_bboxes, default_container_bbox, label_bbox = _box_styles()
 
-        fig, ax = plt.subplots(figsize=(14, 10))
-        ax.set_facecolor('white')
-        ax.axis('off')
+        fig = _new_figure(figsize)
+        ax = fig.add_subplot(frameon=False)
+        ax.set_axis_off()
         ax.set_title(f"C4 Level 2: Container Diagram - {self.system_name}", 
                     fontsize=18, pad=20, fontweight='bold')
 
         # Main system properties
-        system_box_style = dict(boxstyle="round,pad=1.2", edgecolor='black', 
-                               facecolor='#bbdefb', linewidth=2)
         ax.text(0, 0, self.system_name, fontsize=16, ha='center', va='center',
-               fontweight='bold', bbox=system_box_style)
+               fontweight='bold', bbox=system_bbox)
 
         # Position containers in a circle around main system
-        radius = 6
-        angle_step = 360 / len(self.containers)
-        positions = {}
-
-        for idx, container in enumerate(self.containers):
-            angle = idx * angle_step
-            x = np.cos(np.radians(angle)) * radius
-            y = np.sin(np.radians(angle)) * radius
-            
-            positions[container["name"]] = (x, y)
+        positions = self._calculate_positions()
+
+        # Fit the limits to the ring so the drawing lands on the figure;
+        # the arrows are laid out through transData, so this comes first
+        xs, ys = zip(*positions.values())
+        ax.set_xlim(min(min(xs), 0) - _AXES_MARGIN, max(max(xs), 0) + _AXES_MARGIN)
+        ax.set_ylim(min(min(ys), 0) - _AXES_MARGIN, max(max(ys), 0) + _AXES_MARGIN)
+
+        for container in self.containers:
+            x, y = positions[container.name]
             
             # Get container-specific styling
-            bg_color, border_color = self._get_container_color(container["type"])
-            container_label = f"{container['name']}\n[{container['technology']}]"
-            
-            if container.get("description"):
-                container_label += f"\n{container['description']}"
-                
-            if container.get("db_schema"):
-                container_label += f"\nSchema: {container['db_schema']}"
+            container_label = self._container_label(container)
 
             ax.text(x, y, container_label, fontsize=10, ha='center', va='center',
-                   bbox=dict(boxstyle="round,pad=0.6", edgecolor=border_color,
-                           facecolor=bg_color, linewidth=1.5))
+                   bbox=container_bboxes.get(container.type, default_container_bbox))
+
+        # Adjust arrow curvature based on positions
+        curvature = 0.2 if len(self.containers) > 3 else 0
+        segments = []
 
         # Draw relationships with labels
         for rel in self.relationships:
-            source = rel["source"]
-            target = rel["target"]
+            source = rel.source
+            target = rel.target
             
             if source not in positions or target not in positions:
                 continue
@@ -219,38 +387,271 @@ class C4ContainerDiagram:
             src_pos = positions[source]
             tgt_pos = positions[target]
             
-            # Adjust arrow curvature based on positions
-            curvature = 0.2 if len(self.containers) > 3 else 0
-            arrow_style = dict(arrowstyle="->", color='#555555', 
-                             linewidth=1.5, shrinkA=15, shrinkB=15,
-                             connectionstyle=f"arc3,rad={curvature}")
-            
-            if rel.get("bidirectional"):
-                arrow_style["arrowstyle"] = "<->"
-            
-            ax.annotate("", xy=tgt_pos, xytext=src_pos, arrowprops=arrow_style)
+            segments.extend(_arrow_segments(ax.transData, src_pos, tgt_pos, rad=curvature,
+                                            shrink=15, both=rel.bidirectional,
+                                            dpi=fig.dpi))
             
             # Add relationship label with protocol if specified
             mid_x = (src_pos[0] + tgt_pos[0]) / 2
             mid_y = (src_pos[1] + tgt_pos[1]) / 2
             
-            label_text = rel["label"]
-            if rel.get("protocol"):
-                label_text += f" ({rel['protocol']})"
-                
+            label_text = self._relationship_label(rel)
+
             ax.text(mid_x, mid_y, label_text, fontsize=9, ha='center', va='center',
-                   bbox=dict(boxstyle="round,pad=0.2", facecolor='white', alpha=0.8))
+                   bbox=label_bbox, zorder=_LABEL_ZORDER)
+
+        # Every arrow is drawn in a single pass; the layout reaches past the
+        # axes limits, so the arrows must not be clipped or move the limits.
+        # Their heads end inside the boxes, so they are drawn over them
+        if segments:
+            ax.add_collection(LineCollection(segments, colors='#555555', linewidths=1.5, clip_on=False,
+                                             zorder=_ARROW_ZORDER),
+                              autolim=False)
+
+        return fig, ax
+
+    def _calculate_positions(self, radius: float = 6) -> Dict[str, Tuple[float, float]]:
+        """Place containers evenly on a circle around the main system."""
+        names = [c.name for c in self.containers]
+        # Small diagrams need no trigonometry: right, or left and right
+        if len(names) == 1:
+            return {names[0]: (radius, 0.0)}
+        if len(names) == 2:
+            return {names[0]: (radius, 0.0), names[1]: (-radius, 0.0)}
+
+        np = _numpy()
+        angles = np.linspace(0, 2 * np.pi, len(self.containers), endpoint=False)
+        xs = (radius * np.cos(angles)).tolist()
+        ys = (radius * np.sin(angles)).tolist()
+        return dict(zip(names, zip(xs, ys)))
+
+    def _emit_svg(self, output_path: str) -> str:
+        """
+        Write the diagram as SVG markup directly, without Matplotlib.
+        
+        Boxes are sized from the label text, so the result matches the
+        Matplotlib rendering in layout but not pixel for pixel.
+        
+        Args:
+            output_path: Destination .svg file
+            
+        Returns:
+            Path to the generated diagram file
+        """
+        if not self.containers:
+            raise ValueError("No containers added to diagram")
+
+        positions = {name: (x * _SVG_SCALE, -y * _SVG_SCALE)
+                     for name, (x, y) in self._calculate_positions().items()}
+        curvature = 0.2 if len(self.containers) > 3 else 0
+        edges = []
+        boxes = []
+        labels = []
+        bounds = []
+
+        def add_box(cx, cy, text, fill, stroke, stroke_width, font_size, pad, bold=False):
+            lines = text.split("\n")
+            width, height = _svg_box_size(lines, font_size, pad)
+            left, top = cx - width / 2, cy - height / 2
+            bounds.append((left, top, left + width, top + height))
+            boxes.append(f'<rect x="{left:.1f}" y="{top:.1f}" width="{width:.1f}" height="{height:.1f}" '
+                         f'rx="8" fill="{fill}" stroke="{stroke}" stroke-width="{stroke_width}"/>'
+                         + _svg_text(cx, cy, lines, font_size, bold))
+
+        add_box(0, 0, self.system_name, '#bbdefb', 'black', 2, 16, 1.2, bold=True)
+        for container in self.containers:
+            bg_color, border_color = self._get_container_color(container.type)
+            cx, cy = positions[container.name]
+            add_box(cx, cy, self._container_label(container), bg_color, border_color, 1.5, 10, 0.6)
+
+        for rel in self.relationships:
+            if rel.source not in positions or rel.target not in positions:
+                continue
+            (x1, y1), (x2, y2) = positions[rel.source], positions[rel.target]
+            # Same control point as Matplotlib's arc3 connection style (y axis flipped)
+            mx, my = (x1 + x2) / 2, (y1 + y2) / 2
+            cx, cy = mx - curvature * (y2 - y1), my + curvature * (x2 - x1)
+            (sx, sy), (ex, ey) = _svg_shrink((x1, y1), (cx, cy)), _svg_shrink((x2, y2), (cx, cy))
+            start_marker = ' marker-start="url(#arrow)"' if rel.bidirectional else ''
+            edges.append(f'<path d="M{sx:.1f},{sy:.1f} Q{cx:.1f},{cy:.1f} {ex:.1f},{ey:.1f}" fill="none" '
+                         f'stroke="#555555" stroke-width="1.5"{start_marker} marker-end="url(#arrow)"/>')
 
-        # Save diagram
-        output_path = os.path.join(output_dir, f"{self.output_filename}.{output_format}")
-        plt.savefig(output_path, dpi=dpi, bbox_inches='tight', format=output_format)
-        plt.close()
+            lines = [self._relationship_label(rel)]
+            width, height = _svg_box_size(lines, 9, 0.2)
+            labels.append(f'<rect x="{mx - width / 2:.1f}" y="{my - height / 2:.1f}" width="{width:.1f}" '
+                          f'height="{height:.1f}" rx="3" fill="white" fill-opacity="0.8"/>'
+                          + _svg_text(mx, my, lines, 9))
 
-        print(f"Diagram generated at {output_path}")
+        left = min(b[0] for b in bounds) - 20
+        top = min(b[1] for b in bounds) - 60
+        right = max(b[2] for b in bounds) + 20
+        bottom = max(b[3] for b in bounds) + 20
+        title = _svg_text((left + right) / 2, top + 30,
+                          [f"C4 Level 2: Container Diagram - {self.system_name}"], 18, bold=True)
+
+        svg = (f'<svg xmlns="http://www.w3.org/2000/svg" '
+               f'viewBox="{left:.1f} {top:.1f} {right - left:.1f} {bottom - top:.1f}" '
+               f'width="{right - left:.0f}" height="{bottom - top:.0f}" font-family="sans-serif">'
+               f'<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="8" '
+               f'markerHeight="8" orient="auto-start-reverse"><path d="M0,0 L10,5 L0,10" fill="none" '
+               f'stroke="#555555" stroke-width="1.5"/></marker></defs>'
+               f'<rect x="{left:.1f}" y="{top:.1f}" width="100%" height="100%" fill="white"/>'
+               f'{title}{"".join(edges)}{"".join(boxes)}{"".join(labels)}</svg>')
+        with _replacing(output_path) as tmp_path:
+            FilePath(tmp_path).write_text(svg, encoding="utf-8")
+
+        _log.info("Diagram generated at %s", output_path)
         return output_path
 
+    def _output_path(self, output_format: str) -> str:
+        """Return the output file path for a format, creating the output directory."""
+        output_dir = "diagrams_output"
+        FilePath(output_dir).mkdir(exist_ok=True)
+        return os.path.join(output_dir, f"{self.output_filename}.{output_format}")
+
+    def _render(self, fig, output_format: str = "png", dpi: int = 150,
+                optimize: bool = False, compress_level: int = 1) -> str:
+        """
+        Save an already built figure in the given format.
+        
+        Args:
+            fig: Figure returned by `_build_figure`
+            output_format: Image format ('png', 'jpg', 'svg', 'pdf')
+            dpi: Image resolution in dots per inch
+            optimize: Spend extra time compressing PNG output to shrink the file
+            compress_level: zlib level 0-9 for PNG output when not optimizing
+            
+        Returns:
+            Path to the generated diagram file
+        """
+        if output_format not in ["png", "jpg", "svg", "pdf"]:
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+        output_path = self._output_path(output_format)
+        if output_format == "svg":
+            return self._emit_svg(output_path)
+
+        with _replacing(output_path) as tmp_path:
+            if output_format != "png" or not _save_png(fig, tmp_path, dpi, optimize=optimize,
+                                                        compress_level=compress_level):
+                extra = {}
+                if output_format == "png":
+                    extra["pil_kwargs"] = {"optimize": True} if optimize else {"compress_level": compress_level}
+                fig.savefig(tmp_path, dpi=dpi, bbox_inches='tight', format=output_format, **extra)
+
+        _log.info("Diagram generated at %s", output_path)
+        return output_path
+
+    def generate(self, output_format: str = "png", dpi: int = 150,
+                 high_res: bool = False, optimize: bool = False,
+                 compress_level: int = 1) -> str:
+        """
+        Generate the C4 Level 2 Container Diagram.
+        
+        Calling it again for an unchanged diagram returns the file
+        written last time, as long as it is still there untouched.
+        
+        Args:
+            output_format: Image format ('png', 'jpg', 'svg', 'pdf')
+            dpi: Image resolution in dots per inch; 150 is plenty on screen
+            high_res: Render at 300 dpi instead, e.g. for print
+            optimize: Spend extra time compressing PNG output to shrink the file
+            compress_level: zlib level 0-9 for PNG output; 1 trades a slightly
+                larger file for much faster encoding
+            
+        Returns:
+            Path to the generated diagram file
+        """
+        if output_format not in ["png", "jpg", "svg", "pdf"]:
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+        if high_res:
+            dpi = 300
+
+        # Nothing changed since this output was written: reuse the file
+        render_key = (self._state_key(), output_format, dpi, optimize, compress_level)
+        cached = self._last_render.get(render_key)
+        if cached is not None:
+            return cached
+
+        # SVG is written directly and never needs a figure
+        if output_format == "svg":
+            output_path = self._emit_svg(self._output_path(output_format))
+        else:
+            fig, _ = self._build_figure()
+            output_path = self._render(fig, output_format, dpi, optimize, compress_level)
+
+        return self._last_render.put(render_key, output_path)
+
+    def _state_key(self) -> int:
+        """Hash everything the rendered output depends on."""
+        return hash((self.system_name, self.output_filename, tuple(self.containers), tuple(self.relationships)))
+
+    def generate_all(self, output_formats: Sequence[str] = ("png", "svg", "pdf"),
+                     dpi: int = 150) -> List[str]:
+        """
+        Generate the diagram in several formats, one worker process per format.
+        
+        Args:
+            output_formats: Image formats to generate
+            dpi: Image resolution in dots per inch
+            
+        Returns:
+            Paths to the generated diagram files, in the order of `output_formats`
+        """
+        return _generate_all(self, output_formats, dpi)
+
+    @classmethod
+    def generate_many(cls, specs: Iterable[Union[str, bytes, Dict]], output_format: str = "png",
+                      dpi: int = 150, max_workers: Optional[int] = None) -> List[str]:
+        """
+        Generate many Container Diagrams from JSON specs, spread over worker processes.
+        
+        Every diagram is drawn independently, so they render in parallel.
+        Each spec must write its own file: specs that would share an output
+        path, e.g. two without "output_filename", raise ValueError before
+        anything is drawn.
+        
+        Args:
+            specs: JSON strings or dictionaries, as accepted by `from_json`
+            output_format: Image format ('png', 'jpg', 'svg', 'pdf')
+            dpi: Image resolution in dots per inch
+            max_workers: Number of worker processes (default: one per CPU)
+            
+        Returns:
+            Paths to the generated diagram files, in the order of `specs`
+        """
+        return _generate_many(cls, specs, output_format, dpi, max_workers, "Unnamed System")
+
+    @classmethod
+    def save_pdf_book(cls, diagrams: Iterable['C4ContainerDiagram'],
+                      path: Union[str, os.PathLike]) -> str:
+        """
+        Save several Container Diagrams as the pages of a single PDF file.
+        
+        All pages are written through one PdfPages file, which shares the
+        file header and embedded fonts, instead of one PDF per diagram.
+        
+        Args:
+            diagrams: The diagrams to include, one page each
+            path: Destination PDF file
+            
+        Returns:
+            Path of the written file
+        """
+        from matplotlib.backends.backend_pdf import PdfPages
+
+        with PdfPages(path) as pdf:
+            for diagram in diagrams:
+                fig, _ = diagram._build_figure()
+                pdf.savefig(fig, bbox_inches='tight')
+        _log.info("PDF book generated at %s", path)
+        return os.fspath(path)
+
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     # Example usage
     diagram = C4ContainerDiagram("Online Banking System")
     
@@ -278,9 +679,10 @@ if __name__ == "__main__":
     diagram.add_relationship("Transaction Queue", "Customer Database", 
                            "Updates balances", "JDBC", bidirectional=True)
     
-    # Generate diagram in multiple formats
-    diagram.generate(output_format="png")
-    diagram.generate(output_format="svg")
+    # Build the figure once and export it in multiple formats
+    fig, _ = diagram._build_figure()
+    for fmt in ("png", "svg"):
+        diagram._render(fig, fmt)
     
     # Export/import JSON
     json_data = diagram.to_json(indent=2)
@@ -1,13 +1,69 @@
-import matplotlib
-matplotlib.use('Agg')  # Ensure headless plotting
-import matplotlib.pyplot as plt
-import numpy as np
+import logging
 import os
+import re
 import json
 from pathlib import Path as FilePath
-from typing import List, Dict, Optional, Union, Tuple
+from typing import Iterable, List, Dict, NamedTuple, Optional, Sequence, Union, Tuple
+from _render_common import (_arrow_segments, _generate_many, _new_figure, _numpy, _RenderCache,
+                            _replacing, _save_png, _svg_box_size, _svg_shrink, _svg_text)
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, the standard library is used without it
+    orjson = None
+
+_log = logging.getLogger(__name__)
+
+
+class Component(NamedTuple):
+    """A building block inside the container."""
+    name: str
+    technology: str
+    description: Optional[str] = None
+    type: str = "Service"
+    interface: Optional[str] = None
+
+
+class Relationship(NamedTuple):
+    """A labelled connection between two components."""
+    source: str
+    target: str
+    label: str
+    protocol: Optional[str] = None
+    bidirectional: bool = False
+    async_comm: bool = False
+
+
+# JSON keys of a relationship in field order; `async` is a keyword in Python
+_RELATIONSHIP_KEYS = ("source", "target", "label", "protocol", "bidirectional", "async")
+
+# Pixels per layout unit for the direct SVG output
+_SVG_SCALE = 100
+
+# Arrows go over the boxes (text at zorder 3) and under the relationship labels
+_ARROW_ZORDER = 3.5
+_LABEL_ZORDER = 4
+
+# Room around the container boundary, in layout units
+_AXES_MARGIN = 1.0
+
+# Background / border colours per component type
+_COMPONENT_COLORS = {
+    "Service": ('#e3f2fd', '#1565c0'),      # Light blue / Dark blue
+    "Controller": ('#e8f5e9', '#2e7d32'),   # Light green / Dark green
+    "Repository": ('#fff3e0', '#ef6c00'),   # Light orange / Dark orange
+    "Client": ('#f3e5f5', '#7b1fa2'),       # Light purple / Dark purple
+    "Utility": ('#e0f7fa', '#00838f'),      # Light teal / Dark teal
+    "Gateway": ('#ffebee', '#c62828')       # Light red / Dark red
+}
+_DEFAULT_COMPONENT_COLORS = ('#f5f5f5', '#424242')  # Default gray
+
 
 class C4ComponentDiagram:
+    # Letters, digits, dots, dashes and underscores only, so no path separators;
+    # compiled and bound once at import
+    _FILENAME_RE = re.compile(r'[A-Za-z0-9._-]{1,128}\Z').match
+
     def __init__(self, container_name: str, output_filename: str = "c4_level3_component"):
         """
         Initialize a C4 Component Diagram generator.
@@ -18,14 +74,23 @@ class C4ComponentDiagram:
         """
         self.container_name = container_name
         self.output_filename = output_filename
-        self.components: List[Dict] = []
-        self.relationships: List[Dict] = []
+        self.components: List[Component] = []
+        self.relationships: List[Relationship] = []
+        # Ring layout of the components, kept until the next component is added
+        self._positions_cache: Optional[Dict[str, Tuple[float, float]]] = None
+        self._last_render = _RenderCache()
         self._validate_filename(output_filename)
 
+    def _invalidate(self) -> None:
+        """Drop everything derived from the components after a change."""
+        self._positions_cache = None
+        self._last_render.clear()
+
     def _validate_filename(self, filename: str) -> None:
         """Validate the output filename to prevent path traversal."""
-        if not filename.isidentifier():
-            raise ValueError("Output filename must be a valid identifier")
+        if not self._FILENAME_RE(filename):
+            raise ValueError("Output filename may only contain letters, digits, '.', '-' and '_' "
+                             "(at most 128 characters)")
 
     def add_component(self, name: str, technology: str, 
                      description: Optional[str] = None,
@@ -47,13 +112,8 @@ class C4ComponentDiagram:
         if not name or not technology:
             raise ValueError("Component name and technology cannot be empty")
             
-        self.components.append({
-            "name": name,
-            "technology": technology,
-            "description": description,
-            "type": component_type,
-            "interface": interface
-        })
+        self.components.append(Component(name, technology, description, component_type, interface))
+        self._invalidate()
         return self
 
     def add_relationship(self, source: str, target: str, label: str,
@@ -77,28 +137,24 @@ class C4ComponentDiagram:
         if not all([source, target, label]):
             raise ValueError("Source, target and label cannot be empty")
             
-        self.relationships.append({
-            "source": source,
-            "target": target,
-            "label": label,
-            "protocol": protocol,
-            "bidirectional": bidirectional,
-            "async": async_comm
-        })
+        self.relationships.append(Relationship(source, target, label, protocol,
+                                               bidirectional, async_comm))
+        # The layout only depends on the components, so it is kept
+        self._last_render.clear()
         return self
 
-    def from_json(self, json_data: Union[str, Dict]) -> 'C4ComponentDiagram':
+    def from_json(self, json_data: Union[str, bytes, Dict]) -> 'C4ComponentDiagram':
         """
         Load diagram configuration from JSON.
         
         Args:
-            json_data: Either a JSON string or a dictionary
+            json_data: Either a JSON string/bytes or a dictionary
             
         Returns:
             self for method chaining
         """
-        if isinstance(json_data, str):
-            json_data = json.loads(json_data)
+        if isinstance(json_data, (str, bytes)):
+            json_data = orjson.loads(json_data) if orjson is not None else json.loads(json_data)
             
         if "container_name" in json_data:
             self.container_name = json_data["container_name"]
@@ -137,53 +193,264 @@ class C4ComponentDiagram:
         """
         data = {
             "container_name": self.container_name,
-            "components": self.components,
-            "relationships": self.relationships
+            "components": [comp._asdict() for comp in self.components],
+            "relationships": [dict(zip(_RELATIONSHIP_KEYS, rel)) for rel in self.relationships]
         }
+        # orjson only indents by two spaces; other widths go through json
+        if orjson is not None and indent in (None, 2):
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0).decode()
         return json.dumps(data, indent=indent)
 
     def _get_component_color(self, component_type: str) -> Tuple[str, str]:
         """Get color scheme based on component type."""
-        colors = {
-            "Service": ('#e3f2fd', '#1565c0'),      # Light blue / Dark blue
-            "Controller": ('#e8f5e9', '#2e7d32'),   # Light green / Dark green
-            "Repository": ('#fff3e0', '#ef6c00'),   # Light orange / Dark orange
-            "Client": ('#f3e5f5', '#7b1fa2'),       # Light purple / Dark purple
-            "Utility": ('#e0f7fa', '#00838f'),      # Light teal / Dark teal
-            "Gateway": ('#ffebee', '#c62828')       # Light red / Dark red
-        }
-        return colors.get(component_type, ('#f5f5f5', '#424242'))  # Default gray
+        return _COMPONENT_COLORS.get(component_type, _DEFAULT_COMPONENT_COLORS)
 
-    def generate(self, output_format: str = "png", dpi: int = 300) -> str:
+    def _component_label(self, comp: Component) -> str:
+        """Build the multi-line box label of a component."""
+        parts = [comp.name, f"[{comp.technology}]"]
+        if comp.description:
+            parts.append(comp.description)
+        if comp.interface:
+            parts.append(f"Interface: {comp.interface}")
+        return "\n".join(parts)
+
+    def _relationship_label(self, rel: Relationship) -> str:
+        """Build the label of a relationship, with its protocol if specified."""
+        return f"{rel.label} ({rel.protocol})" if rel.protocol else rel.label
+
+    def generate(self, output_format: str = "png", dpi: int = 150,
+                 high_res: bool = False, optimize: bool = False,
+                 compress_level: int = 1) -> str:
         """
         Generate the C4 Level 3 Component Diagram.
         
         Args:
             output_format: Image format ('png', 'jpg', 'svg', 'pdf')
-            dpi: Image resolution in dots per inch
+            dpi: Image resolution in dots per inch; text is the finest detail
+            high_res: Render at 300 dpi instead, e.g. for print
+            optimize: Spend extra time compressing PNG output to shrink the file
+            compress_level: zlib level 0-9 for PNG output; 1 trades a slightly
+                larger file for much faster encoding
             
         Returns:
             Path to the generated diagram file
         """
-        if output_format not in ["png", "jpg", "svg", "pdf"]:
-            raise ValueError(f"Unsupported output format: {output_format}")
+        if high_res:
+            dpi = 300
+        return self.generate_multi((output_format,), dpi, optimize, compress_level)[0]
+
+    def generate_multi(self, output_formats: Sequence[str] = ("png", "svg", "pdf"),
+                       dpi: int = 150, optimize: bool = False,
+                       compress_level: int = 1) -> List[str]:
+        """
+        Generate the diagram in several formats from a single drawing.
+        
+        The figure is built and laid out once, then saved once per format,
+        so text shaping and artist construction are not repeated. SVG is
+        written directly and does not need the figure at all. Formats whose
+        file was already written for the unchanged diagram, and is still
+        there untouched, are not rendered again.
+        
+        Args:
+            output_formats: Image formats to generate
+            dpi: Image resolution in dots per inch
+            optimize: Spend extra time compressing PNG output to shrink the file
+            compress_level: zlib level 0-9 for PNG output when not optimizing
             
+        Returns:
+            Paths to the generated diagram files, in the order requested
+        """
+        for output_format in output_formats:
+            if output_format not in ["png", "jpg", "svg", "pdf"]:
+                raise ValueError(f"Unsupported output format: {output_format}")
+
         if not self.components:
             raise ValueError("No components added to diagram")
 
+        state = self._state_key()
+        paths = {}
+        for output_format in output_formats:
+            cached = self._last_render.get((state, output_format, dpi, optimize, compress_level))
+            if cached is not None:
+                paths[output_format] = cached
+
+        missing = [f for f in dict.fromkeys(output_formats) if f not in paths]
+        fig = self._build_figure() if any(f != "svg" for f in missing) else None
+        for output_format in missing:
+            output_path = self._render(fig, output_format, dpi, optimize, compress_level)
+            paths[output_format] = self._last_render.put(
+                (state, output_format, dpi, optimize, compress_level), output_path)
+        return [paths[output_format] for output_format in output_formats]
+
+    def _state_key(self) -> int:
+        """Hash everything the rendered output depends on."""
+        return hash((self.container_name, self.output_filename,
+                     tuple(self.components), tuple(self.relationships)))
+
+    @classmethod
+    def generate_many(cls, specs: Iterable[Union[str, bytes, Dict]], output_format: str = "png",
+                      dpi: int = 150, max_workers: Optional[int] = None) -> List[str]:
+        """
+        Generate many Component Diagrams from JSON specs, spread over worker processes.
+        
+        Every diagram is drawn independently, so they render in parallel.
+        Each spec must write its own file: specs that would share an output
+        path, e.g. two without "output_filename", raise ValueError before
+        anything is drawn.
+        
+        Args:
+            specs: JSON strings or dictionaries, as accepted by `from_json`
+            output_format: Image format ('png', 'jpg', 'svg', 'pdf')
+            dpi: Image resolution in dots per inch
+            max_workers: Number of worker processes (default: one per CPU)
+            
+        Returns:
+            Paths to the generated diagram files, in the order of `specs`
+        """
+        return _generate_many(cls, specs, output_format, dpi, max_workers, "Unnamed Container")
+
+    def _render(self, fig, output_format: str = "png", dpi: int = 150,
+                optimize: bool = False, compress_level: int = 1) -> str:
+        """
+        Save an already built figure in the given format.
+        
+        Args:
+            fig: Figure returned by `_build_figure`; unused for SVG
+            output_format: Image format ('png', 'jpg', 'svg', 'pdf')
+            dpi: Image resolution in dots per inch
+            optimize: Spend extra time compressing PNG output to shrink the file
+            compress_level: zlib level 0-9 for PNG output when not optimizing
+            
+        Returns:
+            Path to the generated diagram file
+        """
         output_dir = "diagrams_output"
         FilePath(output_dir).mkdir(exist_ok=True)
 
-        fig, ax = plt.subplots(figsize=(14, 10))
+        output_path = os.path.join(output_dir, f"{self.output_filename}.{output_format}")
+        if output_format == "svg":
+            return self._emit_svg(output_path)
+
+        # PNG comes straight from one Agg draw; the rest need savefig's tight pass
+        with _replacing(output_path) as tmp_path:
+            if output_format != "png" or not _save_png(fig, tmp_path, dpi, optimize=optimize,
+                                                        compress_level=compress_level):
+                extra = {}
+                if output_format == "png":
+                    extra["pil_kwargs"] = {"optimize": True} if optimize else {"compress_level": compress_level}
+                fig.savefig(tmp_path, dpi=dpi, bbox_inches='tight', format=output_format, **extra)
+
+        _log.info("Diagram generated at %s", output_path)
+        return output_path
+
+    def _emit_svg(self, output_path: str) -> str:
+        """
+        Write the diagram as SVG markup directly, without Matplotlib.
+        
+        Boxes are sized from the label text, so the result matches the
+        Matplotlib rendering in layout but not pixel for pixel.
+        
+        Args:
+            output_path: Destination .svg file
+            
+        Returns:
+            Path to the generated diagram file
+        """
+        positions = {name: (x * _SVG_SCALE, -y * _SVG_SCALE)
+                     for name, (x, y) in self._calculate_positions().items()}
+        curvature = 0.2 if len(self.components) > 3 else 0
+        edges = []
+        boxes = []
+        labels = []
+
+        # Container boundary, with its name underneath
+        half_width, half_height = 8 * _SVG_SCALE, 6 * _SVG_SCALE
+        bounds = [(-half_width, -half_height, half_width, half_height)]
+        name_lines = [self.container_name]
+        width, height = _svg_box_size(name_lines, 14, 0.3)
+        name_y = half_height + 0.5 * _SVG_SCALE + height / 2
+        bounds.append((-width / 2, name_y - height / 2, width / 2, name_y + height / 2))
+        boundary = (f'<rect x="{-half_width}" y="{-half_height}" width="{2 * half_width}" '
+                    f'height="{2 * half_height}" fill="#f5f5f5" fill-opacity="0.3" '
+                    f'stroke="#333333" stroke-opacity="0.3" stroke-width="2"/>'
+                    f'<rect x="{-width / 2:.1f}" y="{name_y - height / 2:.1f}" width="{width:.1f}" '
+                    f'height="{height:.1f}" rx="5" fill="white" stroke="#333333"/>'
+                    + _svg_text(0, name_y, name_lines, 14))
+
+        for comp in self.components:
+            bg_color, border_color = self._get_component_color(comp.type)
+            cx, cy = positions[comp.name]
+            lines = self._component_label(comp).split("\n")
+            width, height = _svg_box_size(lines, 10, 0.6)
+            left, top = cx - width / 2, cy - height / 2
+            bounds.append((left, top, left + width, top + height))
+            boxes.append(f'<rect x="{left:.1f}" y="{top:.1f}" width="{width:.1f}" height="{height:.1f}" '
+                         f'rx="8" fill="{bg_color}" fill-opacity="0.9" stroke="{border_color}" '
+                         f'stroke-width="1.5"/>' + _svg_text(cx, cy, lines, 10))
+
+        for rel in self.relationships:
+            if rel.source not in positions or rel.target not in positions:
+                continue
+            (x1, y1), (x2, y2) = positions[rel.source], positions[rel.target]
+            # Same control point as Matplotlib's arc3 connection style (y axis flipped)
+            mx, my = (x1 + x2) / 2, (y1 + y2) / 2
+            cx, cy = mx - curvature * (y2 - y1), my + curvature * (x2 - x1)
+            (sx, sy), (ex, ey) = _svg_shrink((x1, y1), (cx, cy)), _svg_shrink((x2, y2), (cx, cy))
+            # Async calls are dashed with a single filled head, as in the figure
+            if rel.async_comm:
+                style = ' stroke-dasharray="6,3" marker-end="url(#arrow-filled)"'
+            else:
+                start_marker = ' marker-start="url(#arrow)"' if rel.bidirectional else ''
+                style = f'{start_marker} marker-end="url(#arrow)"'
+            edges.append(f'<path d="M{sx:.1f},{sy:.1f} Q{cx:.1f},{cy:.1f} {ex:.1f},{ey:.1f}" fill="none" '
+                         f'stroke="#555555" stroke-width="1.5"{style}/>')
+
+            lines = [self._relationship_label(rel)]
+            width, height = _svg_box_size(lines, 9, 0.2)
+            labels.append(f'<rect x="{mx - width / 2:.1f}" y="{my - height / 2:.1f}" width="{width:.1f}" '
+                          f'height="{height:.1f}" rx="3" fill="white" fill-opacity="0.8"/>'
+                          + _svg_text(mx, my, lines, 9))
+
+        left = min(b[0] for b in bounds) - 20
+        top = min(b[1] for b in bounds) - 60
+        right = max(b[2] for b in bounds) + 20
+        bottom = max(b[3] for b in bounds) + 20
+        title = _svg_text((left + right) / 2, top + 30,
+                          [f"C4 Level 3: Component Diagram - {self.container_name}"], 18, bold=True)
+
+        marker = ('<marker id="{id}" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="8" '
+                  'markerHeight="8" orient="auto-start-reverse"><path d="M0,0 L10,5 L0,10{close}" '
+                  'fill="{fill}" stroke="#555555" stroke-width="1.5"/></marker>')
+        svg = (f'<svg xmlns="http://www.w3.org/2000/svg" '
+               f'viewBox="{left:.1f} {top:.1f} {right - left:.1f} {bottom - top:.1f}" '
+               f'width="{right - left:.0f}" height="{bottom - top:.0f}" font-family="sans-serif">'
+               f'<defs>{marker.format(id="arrow", close="", fill="none")}'
+               f'{marker.format(id="arrow-filled", close=" Z", fill="#555555")}</defs>'
+               f'<rect x="{left:.1f}" y="{top:.1f}" width="100%" height="100%" fill="white"/>'
+               f'{title}{boundary}{"".join(edges)}{"".join(boxes)}{"".join(labels)}</svg>')
+        with _replacing(output_path) as tmp_path:
+            FilePath(tmp_path).write_text(svg, encoding="utf-8")
+
+        _log.info("Diagram generated at %s", output_path)
+        return output_path
+
+    def _build_figure(self):
+        """Draw the diagram onto a new figure and return it."""
+        from matplotlib.collections import LineCollection, PolyCollection
+        from matplotlib.patches import Rectangle
+
+        np = _numpy()
+        fig = _new_figure((14, 10))
+        ax = fig.add_subplot()
         ax.set_facecolor('white')
         ax.axis('off')
         ax.set_title(f"C4 Level 3: Component Diagram - {self.container_name}", 
                     fontsize=18, pad=20, fontweight='bold')
 
         # Draw main container boundary
-        container_box = plt.Rectangle((-8, -6), 16, 12, 
-                                    linewidth=2, edgecolor='#333333',
-                                    facecolor='#f5f5f5', alpha=0.3)
+        container_box = Rectangle((-8, -6), 16, 12, 
+                                  linewidth=2, edgecolor='#333333',
+                                  facecolor='#f5f5f5', alpha=0.3)
         ax.add_patch(container_box)
         ax.text(0, -6.5, self.container_name, fontsize=14, ha='center', va='top',
                bbox=dict(boxstyle="round,pad=0.3", facecolor='white', edgecolor='#333333'))
@@ -191,88 +458,111 @@ class C4ComponentDiagram:
         # Position components in a smart layout
         positions = self._calculate_positions()
 
+        # Fit the limits to the container boundary so the drawing lands on the
+        # figure (patches do not autoscale); the arrows are laid out through
+        # transData, so this comes first
+        ax.set_xlim(-8 - _AXES_MARGIN, 8 + _AXES_MARGIN)
+        ax.set_ylim(-6 - _AXES_MARGIN, 6 + _AXES_MARGIN)
+
         # Draw components
         for comp in self.components:
-            x, y = positions[comp["name"]]
+            x, y = positions[comp.name]
             
             # Get component-specific styling
-            bg_color, border_color = self._get_component_color(comp["type"])
-            component_label = f"{comp['name']}\n[{comp['technology']}]"
-            
-            if comp.get("description"):
-                component_label += f"\n{comp['description']}"
-                
-            if comp.get("interface"):
-                component_label += f"\nInterface: {comp['interface']}"
+            bg_color, border_color = self._get_component_color(comp.type)
+            component_label = self._component_label(comp)
 
             ax.text(x, y, component_label, fontsize=10, ha='center', va='center',
                    bbox=dict(boxstyle="round,pad=0.6", edgecolor=border_color,
                            facecolor=bg_color, linewidth=1.5, alpha=0.9))
 
+        # Adjust curvature for better visualization
+        curvature = 0.2 if len(self.components) > 3 else 0
+        lines, line_styles, filled_heads = [], [], []
+
+        # Only relationships between drawn components are shown, so the loop
+        # below needs no checks; their label midpoints are computed for all
+        # of them in one array operation
+        known = positions.keys()
+        drawn = [rel for rel in self.relationships
+                 if rel.source in known and rel.target in known]
+        if len(drawn) < len(self.relationships):
+            _log.warning("Skipping %d relationship(s) with an unknown component: %s",
+                         len(self.relationships) - len(drawn),
+                         ", ".join(f"{rel.source} -> {rel.target}" for rel in self.relationships
+                                   if rel.source not in known or rel.target not in known))
+        if drawn:
+            # Gather both ends of every relationship by component index
+            points = np.array(list(positions.values()))
+            index = {name: i for i, name in enumerate(positions)}
+            src = np.fromiter((index[rel.source] for rel in drawn), dtype=np.intp, count=len(drawn))
+            tgt = np.fromiter((index[rel.target] for rel in drawn), dtype=np.intp, count=len(drawn))
+            midpoints = (0.5 * (points[src] + points[tgt])).tolist()
+        label_bbox = dict(boxstyle="round,pad=0.2", facecolor='white', alpha=0.8)
+
         # Draw relationships with labels
-        for rel in self.relationships:
-            source = rel["source"]
-            target = rel["target"]
-            
-            if source not in positions or target not in positions:
-                continue
-                
-            src_pos = positions[source]
-            tgt_pos = positions[target]
-            
-            # Style arrow based on relationship properties
-            arrow_style = dict(arrowstyle="->", color='#555555', 
-                             linewidth=1.5, shrinkA=15, shrinkB=15)
-            
-            if rel.get("bidirectional"):
-                arrow_style["arrowstyle"] = "<->"
-            if rel.get("async"):
-                arrow_style["arrowstyle"] = "-|>"
-                arrow_style["linestyle"] = "--"
-            
-            # Adjust curvature for better visualization
-            curvature = 0.2 if len(self.components) > 3 else 0
-            arrow_style["connectionstyle"] = f"arc3,rad={curvature}"
+        for i, rel in enumerate(drawn):
+            src_pos = positions[rel.source]
+            tgt_pos = positions[rel.target]
             
-            ax.annotate("", xy=tgt_pos, xytext=src_pos, arrowprops=arrow_style)
+            # Style arrow based on relationship properties: async calls get a
+            # dashed shaft and a single filled head, others open heads
+            is_async = rel.async_comm
+            shaft, *heads = _arrow_segments(ax.transData, src_pos, tgt_pos, rad=curvature,
+                                            shrink=15, both=rel.bidirectional and not is_async,
+                                            dpi=fig.dpi)
+            lines.append(shaft)
+            line_styles.append('--' if is_async else '-')
+            if is_async:
+                filled_heads.extend(heads)
+            else:
+                lines.extend(heads)
+                line_styles.extend('-' * len(heads))
             
             # Add relationship label with protocol if specified
-            mid_x = (src_pos[0] + tgt_pos[0]) / 2
-            mid_y = (src_pos[1] + tgt_pos[1]) / 2
+            mid_x, mid_y = midpoints[i]
             
-            label_text = rel["label"]
-            if rel.get("protocol"):
-                label_text += f" ({rel['protocol']})"
-                
+            label_text = self._relationship_label(rel)
+
             ax.text(mid_x, mid_y, label_text, fontsize=9, ha='center', va='center',
-                   bbox=dict(boxstyle="round,pad=0.2", facecolor='white', alpha=0.8))
+                   bbox=label_bbox, zorder=_LABEL_ZORDER)
 
-        # Save diagram
-        output_path = os.path.join(output_dir, f"{self.output_filename}.{output_format}")
-        plt.savefig(output_path, dpi=dpi, bbox_inches='tight', format=output_format)
-        plt.close()
+        # Every arrow is drawn in one or two passes; they must not be clipped
+        # to the axes or move the limits they were laid out against. Their
+        # heads end inside the boxes, so they are drawn over them
+        if lines:
+            ax.add_collection(LineCollection(lines, colors='#555555', linewidths=1.5,
+                                             linestyles=line_styles, clip_on=False,
+                                             zorder=_ARROW_ZORDER),
+                              autolim=False)
+        if filled_heads:
+            ax.add_collection(PolyCollection(filled_heads, facecolors='#555555', edgecolors='#555555',
+                                             linewidths=1.5, clip_on=False, zorder=_ARROW_ZORDER),
+                              autolim=False)
 
-        print(f"Diagram generated at {output_path}")
-        return output_path
+        return fig
 
     def _calculate_positions(self) -> Dict[str, Tuple[float, float]]:
         """Calculate optimal positions for components based on relationships."""
-        positions = {}
-        
+        if self._positions_cache is not None:
+            return self._positions_cache
+
         # Simple circular layout for now - could be enhanced with graph layout algorithms
         radius = 5
-        angle_step = 360 / len(self.components)
-        
-        for idx, comp in enumerate(self.components):
-            angle = idx * angle_step
-            x = np.cos(np.radians(angle)) * radius
-            y = np.sin(np.radians(angle)) * radius
-            positions[comp["name"]] = (x, y)
-            
-        return positions
+
+        # All angles in one ufunc call instead of one per component
+        np = _numpy()
+        angles = np.radians(np.linspace(0, 360, len(self.components), endpoint=False))
+        xs = (np.cos(angles) * radius).tolist()
+        ys = (np.sin(angles) * radius).tolist()
+
+        self._positions_cache = {comp.name: (x, y) for comp, x, y in zip(self.components, xs, ys)}
+        return self._positions_cache
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     # Example usage
     diagram = C4ComponentDiagram("Order Processing Microservice")
     
@@ -302,15 +592,11 @@ if __name__ == "__main__":
     diagram.add_relationship("Order Service", "Event Publisher", 
                            "Publishes order events", "Kafka", async_comm=True)
     
-    # Generate diagram in multiple formats
-    diagram.generate(output_format="png")
-    diagram.generate(output_format="svg")
-    
     # Export/import JSON
     json_data = diagram.to_json(indent=2)
     print("\nDiagram JSON representation:")
     print(json_data)
     
-    # Create new diagram from JSON
+    # Create new diagram from JSON; it is identical, so draw it once for every format
     new_diagram = C4ComponentDiagram("Temp Container").from_json(json_data)
-    new_diagram.generate(output_format="pdf")
\ No newline at end of file
+    new_diagram.generate_multi(("png", "svg", "pdf"))
\ No newline at end of file
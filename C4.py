@@ -1,14 +1,196 @@
-import matplotlib
-matplotlib.use('Agg')  # Force non-GUI backend
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-import numpy as np
+import hashlib
+import logging
+import math
 import os
+import re
 import json
+from contextlib import contextmanager
 from pathlib import Path as FilePath
-from typing import List, Dict, Optional, Union, Tuple
+from typing import Iterator, List, Dict, Optional, Sequence, Union, Tuple
+from _render_common import (_new_figure, _numpy, _RenderCache, _replacing, _save_png, _svg_box_size,
+                            _svg_shrink, _svg_text)
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, the standard library is used without it
+    orjson = None
+
+_log = logging.getLogger(__name__)
+
+
+# Colour, line style and end marker per relationship type: an open '->'
+# head, a filled '-|>' head, or a ']-' bracket at the start
+_EDGE_STYLES = {
+    "association": ('#333333', '-', 'open'),
+    "inheritance": ('#0d47a1', '-', 'filled'),
+    "interface": ('#7b1fa2', '--', 'filled'),
+    "aggregation": ('#ef6c00', '-', 'bracket'),
+    "composition": ('#c62828', '-', 'bracket'),
+}
+
+# (background, border) colours per class type; interfaces and abstract
+# classes get their own regardless of type
+_CLASS_COLORS = {
+    "Entity": ('#e8f5e9', '#2e7d32'),      # Light green / Dark green
+    "Service": ('#fff3e0', '#ef6c00'),     # Light orange / Dark orange
+    "Repository": ('#fce4ec', '#c2185b'),  # Light pink / Dark pink
+}
+_DEFAULT_CLASS_COLORS = ('#ffffff', '#424242')   # White / Dark gray
+_INTERFACE_CLASS_COLORS = ('#f5f5f5', '#7b1fa2')  # Light gray / Purple
+_ABSTRACT_CLASS_COLORS = ('#e3f2fd', '#0d47a1')   # Light blue / Dark blue
+
+# Class box width and height of its name compartment, in layout units
+_CLASS_WIDTH = 3.5
+_NAME_HEIGHT = 0.6
+
+# Points per layout unit in directly written SVG
+_SVG_SCALE = 50
+
+# Marker geometry in points, as FancyArrowPatch draws it for annotate():
+# (length, half-width) of the heads and (width, depth) of the brackets
+_ARROW_HEAD = (4.0, 2.0)
+_ARROW_BRACKET = (10.0, 2.0)
+
+# Shape of a from_json spec: per section, the keys every record needs (class
+# names, which must be non-empty strings) and the defaults of the others
+_SPEC_SECTIONS = {
+    "classes": (("name",), {"description": None, "attributes": None, "methods": None,
+                            "type": "Class", "is_abstract": False, "is_interface": False}),
+    "associations": (("class1", "class2"), {"label": None, "multiplicity": None,
+                                            "aggregation": False, "composition": False}),
+    "inheritances": (("subclass", "superclass"), {}),
+    "interfaces": (("implementor", "interface"), {}),
+}
+
+
+def _class_height(cls: Dict) -> float:
+    """Height of a class box, which grows with its members and description."""
+    num_methods, num_attributes = len(cls["methods"]), len(cls["attributes"])
+    height = 2.5 + (num_methods + num_attributes) * 0.2
+    
+    # Adjust height based on content
+    if cls["description"]:
+        height += 0.4
+    if num_methods > 3 or num_attributes > 3:
+        height += 0.5
+    return height
+
+
+def _check_spec(json_data) -> Dict[str, List[Dict]]:
+    """
+    Validate the structure of a from_json spec in one pass.
+    
+    A spec that does not fit raises ValueError naming the first bad
+    record, so callers get one error path for malformed input.
+    
+    Args:
+        json_data: Parsed JSON spec
+        
+    Returns:
+        The records of every section, with missing optional keys filled
+        in from `_SPEC_SECTIONS`; absent sections are empty lists
+    """
+    if not isinstance(json_data, dict):
+        raise ValueError("Diagram JSON must be an object")
+    if not isinstance(json_data.get("component_name", ""), str):
+        raise ValueError("'component_name' must be a string")
+
+    spec = {}
+    for section, (required, defaults) in _SPEC_SECTIONS.items():
+        records = json_data.get(section, [])
+        if not isinstance(records, list):
+            raise ValueError(f"'{section}' must be a list")
+        for index, record in enumerate(records):
+            if not isinstance(record, dict):
+                raise ValueError(f"{section}[{index}] must be an object")
+            for key in required:
+                if not record.get(key) or not isinstance(record[key], str):
+                    raise ValueError(f"{section}[{index}]: '{key}' must be a non-empty string")
+        spec[section] = [{**defaults, **record} for record in records]
+    return spec
+
+
+def _edge_segments(trans, starts: 'np.ndarray', ends: 'np.ndarray', shrink: float = 15.0,
+                   dpi: float = 72.0) -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+    """
+    Build the polylines of many straight relationship edges at once.
+    
+    Every line is shortened by `shrink` points at both ends. Its head
+    and its bracket are both returned, and the caller picks the marker
+    its type uses. Point sizes only make sense in display space, so the
+    geometry is worked out there, with one transform for all edges each
+    way.
+    
+    Args:
+        trans: The data-to-display transform of the target Axes
+        starts: (M, 2) edge starts in data coordinates
+        ends: (M, 2) edge ends in data coordinates
+        shrink: Gap left at both ends, in points
+        dpi: Resolution `trans` maps to
+        
+    Returns:
+        Tuple of (M, 2, 2) lines, (M, 3, 2) heads at the ends and
+        (M, 4, 2) outward brackets at the starts, in data coordinates
+    """
+    np = _numpy()
+    px = dpi / 72
+    count = len(starts)
+    p1, p2 = np.split(trans.transform(np.concatenate([starts, ends])), 2)
+    direction = p2 - p1
+    length = np.hypot(direction[:, 0], direction[:, 1])
+    direction /= np.where(length > 0, length, 1)[:, None]
+    normal = np.column_stack([-direction[:, 1], direction[:, 0]])
+    p1, p2 = p1 + direction * shrink * px, p2 - direction * shrink * px
+
+    head_length, head_width = _ARROW_HEAD[0] * px, _ARROW_HEAD[1] * px
+    back = p2 - direction * head_length
+    half, depth = _ARROW_BRACKET[0] / 2 * px, _ARROW_BRACKET[1] * px
+    lines = np.stack([p1, p2], axis=1)
+    heads = np.stack([back + normal * head_width, p2, back - normal * head_width], axis=1)
+    brackets = np.stack([p1 + normal * half - direction * depth, p1 + normal * half,
+                         p1 - normal * half, p1 - normal * half - direction * depth], axis=1)
+
+    # Map the 9 points of every edge back in one go
+    inverse = trans.inverted().transform(np.concatenate([lines, heads, brackets], axis=1).reshape(-1, 2))
+    inverse = inverse.reshape(count, 9, 2)
+    return inverse[:, :2], inverse[:, 2:5], inverse[:, 5:]
+
+
+def _svg_marker_points(start: Tuple[float, float], end: Tuple[float, float],
+                       marker: str) -> List[Tuple[float, float]]:
+    """
+    Return the outline of an edge's end marker in SVG coordinates.
+    
+    Same geometry as `_edge_segments`, with SVG units taken as points.
+    
+    Args:
+        start: Start of the (already shortened) edge
+        end: End of the (already shortened) edge
+        marker: 'open', 'filled' or 'bracket', see `_EDGE_STYLES`
+        
+    Returns:
+        The marker's corner points: a head at `end`, or a bracket at `start`
+    """
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    length = (dx * dx + dy * dy) ** 0.5 or 1
+    ux, uy = dx / length, dy / length
+    nx, ny = -uy, ux
+    if marker == 'bracket':
+        half, depth = _ARROW_BRACKET[0] / 2, _ARROW_BRACKET[1]
+        x, y = start
+        return [(x + nx * half - ux * depth, y + ny * half - uy * depth), (x + nx * half, y + ny * half),
+                (x - nx * half, y - ny * half), (x - nx * half - ux * depth, y - ny * half - uy * depth)]
+    head_length, half = _ARROW_HEAD
+    x, y = end
+    bx, by = x - ux * head_length, y - uy * head_length
+    return [(bx + nx * half, by + ny * half), (x, y), (bx - nx * half, by - ny * half)]
+
 
 class C4CodeDiagram:
+    # Letters, digits, dots, dashes and underscores only, so no path separators;
+    # compiled and bound once at import
+    _FILENAME_RE = re.compile(r'[A-Za-z0-9._-]{1,128}\Z').match
+
     def __init__(self, component_name: str, output_filename: str = "c4_level4_code"):
         """
         Initialize a C4 Level 4 Code Diagram generator.
@@ -23,12 +205,51 @@ class C4CodeDiagram:
         self.associations: List[Dict] = []
         self.inheritances: List[Dict] = []
         self.interfaces: List[Dict] = []
+        self._last_render = _RenderCache()
+        self._figure: Optional[Tuple[Tuple[str, str], object]] = None
+        self._positions_cache: Optional[Dict[str, Tuple[float, float]]] = None
+        # Nesting depth of batch() blocks; while open, changes do not invalidate
+        self._batch_depth = 0
         self._validate_filename(output_filename)
 
+    def _invalidate(self) -> None:
+        """
+        Drop the cached layout after the classes change.
+        
+        Only marks it stale, so any number of add_class calls cost nothing
+        until the next generate() lays the classes out once. Inside a
+        `batch()` block even that is deferred to the end of the block.
+        Rendered files and the figure are keyed by content and need no
+        clearing.
+        """
+        if not self._batch_depth:
+            self._positions_cache = None
+
+    @contextmanager
+    def batch(self) -> Iterator['C4CodeDiagram']:
+        """
+        Add many elements with a single invalidation at the end.
+        
+        The add_* calls inside the block only append; the layout is marked
+        stale once when the outermost block exits. A generate() inside the
+        block lays the classes out afresh without using or keeping the
+        cached layout.
+        
+        Yields:
+            The diagram itself
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            self._invalidate()
+
     def _validate_filename(self, filename: str) -> None:
         """Validate the output filename to prevent path traversal."""
-        if not filename.isidentifier():
-            raise ValueError("Output filename must be a valid identifier")
+        if not self._FILENAME_RE(filename):
+            raise ValueError("Output filename may only contain letters, digits, '.', '-' and '_' "
+                             "(at most 128 characters)")
 
     def add_class(self, name: str, 
                  description: Optional[str] = None,
@@ -64,6 +285,7 @@ class C4CodeDiagram:
             "is_abstract": is_abstract,
             "is_interface": is_interface
         })
+        self._invalidate()
         return self
 
     def add_association(self, class1: str, class2: str, 
@@ -138,58 +360,54 @@ class C4CodeDiagram:
         })
         return self
 
-    def from_json(self, json_data: Union[str, Dict]) -> 'C4CodeDiagram':
+    def from_json(self, json_data: Union[str, bytes, Dict]) -> 'C4CodeDiagram':
         """
         Load diagram configuration from JSON.
         
         Args:
-            json_data: Either a JSON string or a dictionary
+            json_data: Either a JSON string/bytes or a dictionary
             
         Returns:
             self for method chaining
         """
-        if isinstance(json_data, str):
-            json_data = json.loads(json_data)
+        if isinstance(json_data, (str, bytes)):
+            json_data = orjson.loads(json_data) if orjson is not None else json.loads(json_data)
             
+        spec = _check_spec(json_data)
         if "component_name" in json_data:
             self.component_name = json_data["component_name"]
             
-        if "classes" in json_data:
-            for cls in json_data["classes"]:
-                self.add_class(
-                    name=cls["name"],
-                    description=cls.get("description"),
-                    attributes=cls.get("attributes"),
-                    methods=cls.get("methods"),
-                    class_type=cls.get("type", "Class"),
-                    is_abstract=cls.get("is_abstract", False),
-                    is_interface=cls.get("is_interface", False)
-                )
-                
-        if "associations" in json_data:
-            for assoc in json_data["associations"]:
-                self.add_association(
-                    class1=assoc["class1"],
-                    class2=assoc["class2"],
-                    label=assoc.get("label"),
-                    multiplicity=assoc.get("multiplicity"),
-                    aggregation=assoc.get("aggregation", False),
-                    composition=assoc.get("composition", False)
-                )
-                
-        if "inheritances" in json_data:
-            for inh in json_data["inheritances"]:
-                self.add_inheritance(
-                    subclass=inh["subclass"],
-                    superclass=inh["superclass"]
-                )
-                
-        if "interfaces" in json_data:
-            for interface in json_data["interfaces"]:
-                self.add_interface_implementation(
-                    implementor=interface["implementor"],
-                    interface=interface["interface"]
-                )
+        # Build each section's records in one pass and extend in bulk; the
+        # whole spec was checked first, so a bad one is rejected without
+        # leaving half of it loaded
+        classes = [{
+            "name": cls["name"],
+            "description": cls["description"],
+            "attributes": cls["attributes"] or [],
+            "methods": cls["methods"] or [],
+            "type": cls["type"],
+            "is_abstract": cls["is_abstract"],
+            "is_interface": cls["is_interface"]
+        } for cls in spec["classes"]]
+        associations = [{
+            "class1": assoc["class1"],
+            "class2": assoc["class2"],
+            "label": assoc["label"],
+            "multiplicity": assoc["multiplicity"],
+            "aggregation": assoc["aggregation"],
+            "composition": assoc["composition"]
+        } for assoc in spec["associations"]]
+        inheritances = [{"subclass": inh["subclass"], "superclass": inh["superclass"]}
+                        for inh in spec["inheritances"]]
+        interfaces = [{"implementor": interface["implementor"], "interface": interface["interface"]}
+                      for interface in spec["interfaces"]]
+
+        self.classes.extend(classes)
+        if classes:
+            self._invalidate()
+        self.associations.extend(associations)
+        self.inheritances.extend(inheritances)
+        self.interfaces.extend(interfaces)
         return self
 
     def to_json(self, indent: Optional[int] = None) -> str:
@@ -209,21 +427,18 @@ class C4CodeDiagram:
             "inheritances": self.inheritances,
             "interfaces": self.interfaces
         }
+        # orjson only indents by two spaces; other widths go through json
+        if orjson is not None and indent in (None, 2):
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0).decode()
         return json.dumps(data, indent=indent)
 
     def _get_class_color(self, class_type: str, is_abstract: bool, is_interface: bool) -> Tuple[str, str]:
         """Get color scheme based on class type."""
         if is_interface:
-            return ('#f5f5f5', '#7b1fa2')  # Light gray / Purple
+            return _INTERFACE_CLASS_COLORS
         if is_abstract:
-            return ('#e3f2fd', '#0d47a1')  # Light blue / Dark blue
-        if class_type == "Entity":
-            return ('#e8f5e9', '#2e7d32')  # Light green / Dark green
-        if class_type == "Service":
-            return ('#fff3e0', '#ef6c00')  # Light orange / Dark orange
-        if class_type == "Repository":
-            return ('#fce4ec', '#c2185b')  # Light pink / Dark pink
-        return ('#ffffff', '#424242')      # White / Dark gray
+            return _ABSTRACT_CLASS_COLORS
+        return _CLASS_COLORS.get(class_type, _DEFAULT_CLASS_COLORS)
 
     def _get_class_font_style(self, is_abstract: bool, is_interface: bool) -> Dict:
         """Get font style based on class properties."""
@@ -235,34 +450,15 @@ class C4CodeDiagram:
         return style
 
     def _draw_class(self, ax, x: float, y: float, cls: Dict) -> None:
-        """Draw a class box with all its contents."""
-        width = 3.5
-        height = 2.5 + (len(cls["methods"]) * 0.2 + (len(cls["attributes"]) * 0.2)
-        
-        # Adjust height based on content
-        if cls["description"]:
-            height += 0.4
-        if len(cls["methods"]) > 3 or len(cls["attributes"]) > 3:
-            height += 0.5
-            
-        bg_color, border_color = self._get_class_color(
-            cls["type"], cls["is_abstract"], cls["is_interface"])
-        
-        # Draw class box
-        rect = patches.Rectangle(
-            (x - width/2, y - height/2), width, height,
-            linewidth=1.5, edgecolor=border_color, 
-            facecolor=bg_color, alpha=0.9)
-        ax.add_patch(rect)
+        """
+        Draw the contents of a class box.
         
-        # Draw class name compartment
-        name_comp_height = 0.6
-        name_rect = patches.Rectangle(
-            (x - width/2, y - height/2 + height - name_comp_height), 
-            width, name_comp_height,
-            linewidth=1.5, edgecolor=border_color, 
-            facecolor=border_color, alpha=0.2)
-        ax.add_patch(name_rect)
+        The boxes themselves are drawn for all classes at once in
+        `_build_figure`.
+        """
+        width = _CLASS_WIDTH
+        height = _class_height(cls)
+        name_comp_height = _NAME_HEIGHT
         
         # Add class name
         class_name = f"<<interface>>\n{cls['name']}" if cls["is_interface"] else cls["name"]
@@ -290,74 +486,236 @@ class C4CodeDiagram:
             ax.text(x - width/2 + 0.1, current_y - 0.1, methods_text,
                     ha='left', va='top', fontsize=9, family='monospace')
 
-    def _draw_relationship(self, ax, start: Tuple[float, float], end: Tuple[float, float], 
-                          rel_type: str, label: Optional[str] = None,
-                          multiplicity: Optional[str] = None) -> None:
-        """Draw a relationship between classes."""
-        arrow_style = {
-            "arrowstyle": "->",
-            "color": "#333333",
-            "linewidth": 1.5,
-            "shrinkA": 15,
-            "shrinkB": 15
-        }
-        
-        # Customize arrow based on relationship type
-        if rel_type == "inheritance":
-            arrow_style["arrowstyle"] = "-|>"
-            arrow_style["color"] = "#0d47a1"
-        elif rel_type == "interface":
-            arrow_style["arrowstyle"] = "-|>"
-            arrow_style["linestyle"] = "--"
-            arrow_style["color"] = "#7b1fa2"
-        elif rel_type == "aggregation":
-            arrow_style["arrowstyle"] = "]-"
-            arrow_style["color"] = "#ef6c00"
-        elif rel_type == "composition":
-            arrow_style["arrowstyle"] = "]-"
-            arrow_style["color"] = "#c62828"
-            
-        ax.annotate("", xy=end, xytext=start, arrowprops=arrow_style)
-        
-        # Add label if provided
+    def _draw_relationship_label(self, ax, start: Tuple[float, float], end: Tuple[float, float],
+                                 label: Optional[str] = None,
+                                 multiplicity: Optional[str] = None) -> None:
+        """Label a relationship between classes at its midpoint."""
+        # The edges themselves are drawn together per type in _build_figure
         if label or multiplicity:
             mid_x = (start[0] + end[0]) / 2
             mid_y = (start[1] + end[1]) / 2
-            
-            label_text = ""
-            if label:
-                label_text += label
-            if multiplicity:
-                if label_text:
-                    label_text += "\n"
-                label_text += multiplicity
-                
+            label_text = "\n".join(filter(None, (label, multiplicity)))
             ax.text(mid_x, mid_y, label_text, fontsize=8, 
                    ha='center', va='center', 
                    bbox=dict(boxstyle="round,pad=0.2", 
                            facecolor='white', alpha=0.8))
 
-    def generate(self, output_format: str = "png", dpi: int = 300) -> str:
+    def _relationship_edges(self, positions: Dict[str, Tuple[float, float]]) -> Iterator[Tuple]:
+        """
+        Yield every relationship whose classes are both placed.
+        
+        Args:
+            positions: Class positions from `_calculate_positions`
+            
+        Returns:
+            Iterator of (start, end, type, label, multiplicity) tuples, with
+            the type a key of `_EDGE_STYLES`
+        """
+        for assoc in self.associations:
+            if assoc["class1"] in positions and assoc["class2"] in positions:
+                rel_type = "aggregation" if assoc["aggregation"] else (
+                          "composition" if assoc["composition"] else "association")
+                yield (positions[assoc["class1"]], positions[assoc["class2"]],
+                       rel_type, assoc.get("label"), assoc.get("multiplicity"))
+
+        for inh in self.inheritances:
+            if inh["subclass"] in positions and inh["superclass"] in positions:
+                yield (positions[inh["subclass"]], positions[inh["superclass"]],
+                       "inheritance", None, None)
+
+        for interface in self.interfaces:
+            if interface["implementor"] in positions and interface["interface"] in positions:
+                yield (positions[interface["implementor"]], positions[interface["interface"]],
+                       "interface", None, None)
+
+    def generate(self, output_format: str = "png", dpi: int = 150,
+                 high_res: bool = False, optimize: bool = False,
+                 compress_level: int = 1) -> str:
         """
         Generate the C4 Level 4 Code Diagram.
         
+        Calling it again for an unchanged diagram returns the file
+        written last time, as long as it is still there untouched.
+        
         Args:
             output_format: Image format ('png', 'jpg', 'svg', 'pdf')
-            dpi: Image resolution in dots per inch
+            dpi: Image resolution in dots per inch; 150 is plenty on screen
+            high_res: Render at 300 dpi instead, e.g. for print
+            optimize: Spend extra time compressing PNG output to shrink the file
+            compress_level: zlib level 0-9 for PNG output; 1 trades a slightly
+                larger file for much faster encoding
             
         Returns:
             Path to the generated diagram file
         """
-        if output_format not in ["png", "jpg", "svg", "pdf"]:
-            raise ValueError(f"Unsupported output format: {output_format}")
+        if high_res:
+            dpi = 300
+        return self.generate_multi((output_format,), dpi, optimize, compress_level)[0]
+
+    def generate_multi(self, output_formats: Sequence[str] = ("png", "svg", "pdf"),
+                       dpi: int = 150, optimize: bool = False,
+                       compress_level: int = 1) -> List[str]:
+        """
+        Generate the diagram in several formats from a single drawing.
+        
+        The figure is built once and saved once per format. It is kept
+        until the diagram changes, so separate `generate` calls for other
+        formats reuse it as well. SVG is written directly and does not
+        need the figure at all.
+        
+        Args:
+            output_formats: Image formats to generate
+            dpi: Image resolution in dots per inch
+            optimize: Spend extra time compressing PNG output to shrink the file
+            compress_level: zlib level 0-9 for PNG output when not optimizing
+            
+        Returns:
+            Paths to the generated diagram files, in the order requested
+        """
+        for output_format in output_formats:
+            if output_format not in ["png", "jpg", "svg", "pdf"]:
+                raise ValueError(f"Unsupported output format: {output_format}")
             
         if not self.classes:
             raise ValueError("No classes added to diagram")
 
+        # Nothing changed since an output was written: reuse the file
+        key = self._cache_key()
+        paths = {}
+        for output_format in output_formats:
+            cached = self._last_render.get((key, output_format, dpi, optimize, compress_level))
+            if cached is not None:
+                paths[output_format] = cached
+
+        missing = [f for f in dict.fromkeys(output_formats) if f not in paths]
+        if (any(f != "svg" for f in missing)
+                and (self._figure is None or self._figure[0] != key)):
+            self._figure = (key, self._build_figure())
+
         output_dir = "diagrams_output"
         FilePath(output_dir).mkdir(exist_ok=True)
+        for output_format in missing:
+            output_path = os.path.join(output_dir, f"{self.output_filename}.{output_format}")
+            if output_format == "svg":
+                self._emit_svg(output_path)
+            else:
+                # PNG comes straight from one Agg draw; the rest need savefig's tight pass
+                fig = self._figure[1]
+                with _replacing(output_path) as tmp_path:
+                    if output_format != "png" or not _save_png(fig, tmp_path, dpi, optimize=optimize,
+                                                                compress_level=compress_level):
+                        extra = {}
+                        if output_format == "png":
+                            extra["pil_kwargs"] = ({"optimize": True} if optimize
+                                                   else {"compress_level": compress_level})
+                        fig.savefig(tmp_path, dpi=dpi, bbox_inches='tight', format=output_format, **extra)
+            _log.info("Diagram generated at %s", output_path)
+            paths[output_format] = self._last_render.put(
+                (key, output_format, dpi, optimize, compress_level), output_path)
+        return [paths[output_format] for output_format in output_formats]
+
+    def _emit_svg(self, output_path: str) -> None:
+        """
+        Write the diagram as SVG markup directly, without Matplotlib.
+        
+        Lengths are in points, `_SVG_SCALE` of them per layout unit, so the
+        boxes, fonts and arrow markers keep the proportions of the
+        Matplotlib rendering; text is laid out by estimate, so it matches
+        in layout but not pixel for pixel.
+        
+        Args:
+            output_path: Destination .svg file
+        """
+        positions = {name: (x * _SVG_SCALE, -y * _SVG_SCALE)
+                     for name, (x, y) in self._calculate_positions().items()}
+        bounds = []
+        boxes = []
+        edges = []
+        labels = []
+
+        width = _CLASS_WIDTH * _SVG_SCALE
+        header = _NAME_HEIGHT * _SVG_SCALE
+        for cls in self.classes:
+            if cls["name"] not in positions:
+                continue
+            x, y = positions[cls["name"]]
+            height = _class_height(cls) * _SVG_SCALE
+            left, top = x - width / 2, y - height / 2
+            bounds.append((left, top, left + width, top + height))
+            bg_color, border_color = self._get_class_color(
+                cls["type"], cls["is_abstract"], cls["is_interface"])
+            name_lines = ["<<interface>>", cls["name"]] if cls["is_interface"] else [cls["name"]]
+            parts = [f'<rect x="{left:.1f}" y="{top:.1f}" width="{width:.1f}" height="{height:.1f}" '
+                     f'fill="{bg_color}" fill-opacity="0.9" stroke="{border_color}" stroke-width="1.5"/>'
+                     f'<rect x="{left:.1f}" y="{top:.1f}" width="{width:.1f}" height="{header:.1f}" '
+                     f'fill="{border_color}" fill-opacity="0.2" stroke="{border_color}" '
+                     f'stroke-opacity="0.2" stroke-width="1.5"/>',
+                     _svg_text(x, top + header / 2, name_lines, 11, bold=True)]
 
-        fig, ax = plt.subplots(figsize=(16, 12))
+            # Same running offsets as _draw_class, with the y axis flipped
+            current_y = top + header + 0.3 * _SVG_SCALE
+            if cls["description"]:
+                parts.append(_svg_text(x, current_y, [cls["description"]], 8, valign="top"))
+                current_y += 0.4 * _SVG_SCALE
+            text_x = left + 0.1 * _SVG_SCALE
+            members = cls["attributes"] + cls["methods"]
+            if members:
+                # Member text may run past the box, as it does in the figure
+                text_width = _svg_box_size(members, 9, 0)[0]
+                bounds.append((left, top, max(left + width, text_x + text_width), top + height))
+            if cls["attributes"]:
+                parts.append(_svg_text(text_x, current_y + 0.1 * _SVG_SCALE, cls["attributes"], 9,
+                                       anchor="start", valign="top", monospace=True))
+                current_y += len(cls["attributes"]) * 0.2 * _SVG_SCALE
+            if cls["methods"]:
+                parts.append(_svg_text(text_x, current_y + 0.1 * _SVG_SCALE, cls["methods"], 9,
+                                       anchor="start", valign="top", monospace=True))
+            boxes.append("".join(parts))
+
+        for start, end, rel_type, label, multiplicity in self._relationship_edges(positions):
+            color, linestyle, marker = _EDGE_STYLES[rel_type]
+            (sx, sy), (ex, ey) = _svg_shrink(start, end, 15), _svg_shrink(end, start, 15)
+            dashes = ' stroke-dasharray="5.6,2.4"' if linestyle == '--' else ''
+            # Heads are plain paths rather than SVG markers, which not every
+            # renderer supports
+            shape = "M" + " L".join(f"{px:.1f},{py:.1f}"
+                                    for px, py in _svg_marker_points((sx, sy), (ex, ey), marker))
+            fill = color if marker == 'filled' else 'none'
+            edges.append(f'<line x1="{sx:.1f}" y1="{sy:.1f}" x2="{ex:.1f}" y2="{ey:.1f}" '
+                         f'stroke="{color}" stroke-width="1.5"{dashes}/>'
+                         f'<path d="{shape}{" Z" if marker == "filled" else ""}" fill="{fill}" '
+                         f'stroke="{color}" stroke-width="1.5"/>')
+
+            lines = [line for line in (label, multiplicity) if line]
+            if lines:
+                mx, my = (start[0] + end[0]) / 2, (start[1] + end[1]) / 2
+                box_width, box_height = _svg_box_size(lines, 8, 0.2)
+                labels.append(f'<rect x="{mx - box_width / 2:.1f}" y="{my - box_height / 2:.1f}" '
+                              f'width="{box_width:.1f}" height="{box_height:.1f}" rx="2" '
+                              f'fill="white" fill-opacity="0.8" stroke="black"/>'
+                              + _svg_text(mx, my, lines, 8))
+
+        left = min(b[0] for b in bounds) - 20
+        top = min(b[1] for b in bounds) - 60
+        right = max(b[2] for b in bounds) + 20
+        bottom = max(b[3] for b in bounds) + 20
+        title = _svg_text((left + right) / 2, top + 30,
+                          [f"C4 Level 4: Code Diagram - {self.component_name}"], 18, bold=True)
+
+        svg = (f'<svg xmlns="http://www.w3.org/2000/svg" '
+               f'viewBox="{left:.1f} {top:.1f} {right - left:.1f} {bottom - top:.1f}" '
+               f'width="{right - left:.0f}pt" height="{bottom - top:.0f}pt" font-family="sans-serif">'
+               f'<rect x="{left:.1f}" y="{top:.1f}" width="100%" height="100%" fill="white"/>'
+               f'{title}{"".join(boxes)}{"".join(edges)}{"".join(labels)}</svg>')
+        with _replacing(output_path) as tmp_path:
+            FilePath(tmp_path).write_text(svg, encoding="utf-8")
+
+    def _build_figure(self):
+        """Lay out and draw the diagram on a new figure, ready to be saved."""
+        from matplotlib.collections import LineCollection, PolyCollection
+
+        fig = _new_figure((16, 12))
+        ax = fig.add_subplot()
         ax.set_facecolor('white')
         ax.axis('off')
         ax.set_title(f"C4 Level 4: Code Diagram - {self.component_name}", 
@@ -367,67 +725,105 @@ class C4CodeDiagram:
         positions = self._calculate_positions()
 
         # Draw all classes
-        for cls in self.classes:
-            if cls["name"] in positions:
-                x, y = positions[cls["name"]]
-                self._draw_class(ax, x, y, cls)
+        np = _numpy()
+        placed = [cls for cls in self.classes if cls["name"] in positions]
+        for cls in placed:
+            x, y = positions[cls["name"]]
+            self._draw_class(ax, x, y, cls)
 
-        # Draw all relationships
-        for assoc in self.associations:
-            if assoc["class1"] in positions and assoc["class2"] in positions:
-                rel_type = "aggregation" if assoc["aggregation"] else (
-                          "composition" if assoc["composition"] else "association")
-                self._draw_relationship(
-                    ax, positions[assoc["class1"]], positions[assoc["class2"]],
-                    rel_type, assoc.get("label"), assoc.get("multiplicity"))
+        # Their boxes go out as two collections built from one vertex array
+        # each, the name compartments above the bodies
+        centres = np.array([positions[cls["name"]] for cls in placed], dtype=float).reshape(-1, 2)
+        heights = np.array([_class_height(cls) for cls in placed], dtype=float)
+        bg_colors, border_colors = zip(*(self._get_class_color(
+            cls["type"], cls["is_abstract"], cls["is_interface"]) for cls in placed))
+        corners = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=float)
+        left = centres[:, 0] - _CLASS_WIDTH / 2
+        top = centres[:, 1] + heights / 2
+        sizes = np.column_stack([np.full_like(heights, _CLASS_WIDTH), heights])
+        bodies = np.column_stack([left, top - heights])[:, None] + corners * sizes[:, None]
+        headers = np.column_stack([left, top - _NAME_HEIGHT])[:, None] + corners * (_CLASS_WIDTH, _NAME_HEIGHT)
+        ax.add_collection(PolyCollection(bodies, facecolors=bg_colors, edgecolors=border_colors,
+                                         linewidths=1.5, alpha=0.9))
+        ax.add_collection(PolyCollection(headers, facecolors=border_colors, edgecolors=border_colors,
+                                         linewidths=1.5, alpha=0.2))
 
-        # Draw inheritances
-        for inh in self.inheritances:
-            if inh["subclass"] in positions and inh["superclass"] in positions:
-                self._draw_relationship(
-                    ax, positions[inh["subclass"]], positions[inh["superclass"]],
-                    "inheritance")
+        # Fix the limits fitted to the boxes; the edges are laid out through
+        # transData, so they must not change afterwards
+        ax.set_xlim(ax.get_xlim())
+        ax.set_ylim(ax.get_ylim())
 
-        # Draw interface implementations
-        for interface in self.interfaces:
-            if interface["implementor"] in positions and interface["interface"] in positions:
-                self._draw_relationship(
-                    ax, positions[interface["implementor"]], positions[interface["interface"]],
-                    "interface")
+        # Draw all relationships: the geometry of every edge in one batch,
+        # then one line collection, plus one for filled heads, per type
+        edges = list(self._relationship_edges(positions))
+        if edges:
+            np = _numpy()
+            starts, ends, rel_types, labels, multiplicities = zip(*edges)
+            lines, heads, brackets = _edge_segments(ax.transData, np.array(starts), np.array(ends),
+                                                    dpi=fig.dpi)
+            rel_types = np.array(rel_types)
+            for rel_type, (color, linestyle, marker) in _EDGE_STYLES.items():
+                selected = rel_types == rel_type
+                if not selected.any():
+                    continue
+                segments = list(lines[selected])
+                if marker == 'bracket':
+                    segments += list(brackets[selected])
+                elif marker == 'open':
+                    segments += list(heads[selected])
+                ax.add_collection(LineCollection(segments, colors=color, linewidths=1.5,
+                                                 linestyles=linestyle, clip_on=False),
+                                  autolim=False)
+                if marker == 'filled':
+                    ax.add_collection(PolyCollection(heads[selected], facecolors=color,
+                                                     edgecolors=color, linewidths=1.5,
+                                                     clip_on=False),
+                                      autolim=False)
 
-        # Save diagram
-        output_path = os.path.join(output_dir, f"{self.output_filename}.{output_format}")
-        plt.savefig(output_path, dpi=dpi, bbox_inches='tight', format=output_format)
-        plt.close()
+            for start, end, label, multiplicity in zip(starts, ends, labels, multiplicities):
+                self._draw_relationship_label(ax, start, end, label, multiplicity)
 
-        print(f"Diagram generated at {output_path}")
-        return output_path
+        return fig
+
+    def _cache_key(self) -> Tuple[str, str]:
+        """
+        Identify the diagram contents for the render cache.
+        
+        The class and relationship records are mutable dicts, so instead of
+        tracking every change they are fingerprinted by a hash of their JSON.
+        """
+        return self.output_filename, hashlib.blake2b(self.to_json().encode(), digest_size=16).hexdigest()
 
     def _calculate_positions(self) -> Dict[str, Tuple[float, float]]:
         """Calculate class positions using a simple force-directed layout."""
+        if self._positions_cache is not None and not self._batch_depth:
+            return self._positions_cache
+
         # Simple grid layout for demonstration
         # In a real implementation, consider using a proper graph layout algorithm
-        positions = {}
+        np = _numpy()
         num_classes = len(self.classes)
-        cols = int(np.ceil(np.sqrt(num_classes)))
-        rows = int(np.ceil(num_classes / cols))
+        # ceil(sqrt(n)) and ceil(n / cols) in integer arithmetic
+        cols = math.isqrt(max(num_classes - 1, 0)) + 1
+        rows = -(-num_classes // cols)
         
         x_spacing = 6
         y_spacing = 5
         start_x = - (cols - 1) * x_spacing / 2
         start_y = (rows - 1) * y_spacing / 2
         
-        for idx, cls in enumerate(self.classes):
-            col = idx % cols
-            row = idx // cols
-            x = start_x + col * x_spacing
-            y = start_y - row * y_spacing
-            positions[cls["name"]] = (x, y)
+        # Grid cell of every class at once, in reading order
+        row_idx, col_idx = np.divmod(np.arange(num_classes), cols)
+        xs = (start_x + col_idx * x_spacing).tolist()
+        ys = (start_y - row_idx * y_spacing).tolist()
             
-        return positions
+        self._positions_cache = dict(zip([cls["name"] for cls in self.classes], zip(xs, ys)))
+        return self._positions_cache
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     # Example usage
     diagram = C4CodeDiagram("Order Processing Component")
     
@@ -502,8 +898,7 @@ if __name__ == "__main__":
     diagram.add_interface_implementation("EmailServiceImpl", "IEmailService")
     
     # Generate diagram in multiple formats
-    diagram.generate(output_format="png")
-    diagram.generate(output_format="svg")
+    diagram.generate_multi(("png", "svg"))
     
     # Export/import JSON
     json_data = diagram.to_json(indent=2)
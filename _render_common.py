@@ -0,0 +1,350 @@
+"""Drawing helpers shared by the C1-C4 diagram modules."""
+
+import inspect
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, suppress
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+from xml.sax.saxutils import escape
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, the standard library is used without it
+    orjson = None
+
+# Matplotlib and NumPy are only needed to draw, so they are imported on first
+# use; building diagrams and converting them to and from JSON never loads them
+np = None
+
+
+def _new_figure(figsize: Tuple[float, float]):
+    """
+    Create a figure on its own Agg canvas, without going through pyplot.
+    
+    Such a figure is not registered with pyplot's global figure manager,
+    so creating and dropping many of them takes no locks and needs no
+    GUI backend; it is freed like any other object.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _numpy():
+    """Import NumPy on first use and return it."""
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+# Arrow geometry for the batched collections: samples along a curved
+# shaft and the (length, half-width) of the heads in points
+_ARROW_SAMPLES = 32
+_ARROW_HEAD = (4.0, 2.0)
+
+
+def _svg_box_size(lines: List[str], font_size: float, pad: float) -> Tuple[float, float]:
+    """Estimate the size of a padded text box, as Matplotlib's boxstyle pad does."""
+    width = max(len(line) for line in lines) * font_size * 0.6 + 2 * pad * font_size
+    height = len(lines) * font_size * 1.2 + 2 * pad * font_size
+    return width, height
+
+
+def _svg_text(x: float, y: float, lines: List[str], font_size: float, bold: bool = False,
+              anchor: str = "middle", valign: str = "center", monospace: bool = False) -> str:
+    """
+    Return an SVG text element with one line per tspan.
+    
+    Args:
+        x: Anchor x position
+        y: Vertical centre of the block, or its top if `valign` is 'top'
+        lines: Text lines
+        font_size: Font size in points
+        bold: Whether to use a bold weight
+        anchor: SVG text-anchor, 'start', 'middle' or 'end'
+        valign: 'center' or 'top'
+        monospace: Whether to use a monospace font
+        
+    Returns:
+        The text element's markup
+    """
+    line_height = font_size * 1.2
+    if valign == "top":
+        first = y + line_height / 2
+    else:
+        first = y - line_height * (len(lines) - 1) / 2
+    extra = (' font-weight="bold"' if bold else '') + (' font-family="monospace"' if monospace else '')
+    spans = ''.join(f'<tspan x="{x:.1f}" y="{first + i * line_height:.1f}">{escape(line)}</tspan>'
+                    for i, line in enumerate(lines))
+    return (f'<text text-anchor="{anchor}" dominant-baseline="central" '
+            f'font-size="{font_size}"{extra}>{spans}</text>')
+
+
+def _svg_shrink(point: Tuple[float, float], towards: Tuple[float, float],
+                distance: float = 20) -> Tuple[float, float]:
+    """Move an arrow end point towards another point, like Matplotlib's shrinkA/shrinkB."""
+    dx, dy = towards[0] - point[0], towards[1] - point[1]
+    length = (dx * dx + dy * dy) ** 0.5
+    if length <= distance:
+        return point
+    return point[0] + dx * distance / length, point[1] + dy * distance / length
+
+
+def _trim_polyline(points: 'np.ndarray', distance: float) -> 'np.ndarray':
+    """Cut `distance` off the start of a polyline, interpolating the new first point."""
+    np = _numpy()
+    dist = np.hypot(*(points - points[0]).T)
+    beyond = dist >= distance
+    if distance <= 0 or not beyond.any():
+        return points
+    i = int(beyond.argmax())
+    frac = (distance - dist[i - 1]) / (dist[i] - dist[i - 1])
+    return np.vstack([points[i - 1] + frac * (points[i] - points[i - 1]), points[i:]])
+
+
+def _arrow_head(tip: 'np.ndarray', before: 'np.ndarray', length: float, width: float) -> 'np.ndarray':
+    """Return the '->' head at `tip` for a line arriving from `before`."""
+    np = _numpy()
+    direction = tip - before
+    direction /= np.hypot(*direction) or 1
+    normal = np.array([-direction[1], direction[0]]) * width
+    back = tip - direction * length
+    return np.array([back + normal, tip, back - normal])
+
+
+def _arrow_segments(trans, start: Tuple[float, float], end: Tuple[float, float],
+                    rad: float = 0.0, shrink: float = 2.0, both: bool = False,
+                    dpi: float = 72.0) -> List['np.ndarray']:
+    """
+    Build the polylines of one arrow for a LineCollection.
+    
+    The shaft follows Matplotlib's arc3 connection (a straight line when
+    `rad` is 0) and is shortened by `shrink` points at each end, with
+    heads sized like FancyArrowPatch's '->' and '-|>'. Point sizes only
+    make sense in display space, so the geometry is worked out there
+    through `trans` and mapped back to data coordinates.
+    
+    Args:
+        trans: The data-to-display transform of the target Axes
+        start: Arrow start in data coordinates
+        end: Arrow end in data coordinates
+        rad: arc3 curvature
+        shrink: Gap left at both ends, in points
+        both: Whether to draw a head at the start as well
+        dpi: Resolution `trans` maps to
+        
+    Returns:
+        List of polylines in data coordinates: the shaft, then the heads
+    """
+    np = _numpy()
+    px = dpi / 72
+    p1, p2 = trans.transform([start, end])
+    d = p2 - p1
+    control = (p1 + p2) / 2 + rad * np.array([d[1], -d[0]])
+    t = np.linspace(0, 1, _ARROW_SAMPLES if rad else 2)[:, None]
+    curve = (1 - t) ** 2 * p1 + 2 * (1 - t) * t * control + t ** 2 * p2
+    curve = _trim_polyline(_trim_polyline(curve, shrink * px)[::-1], shrink * px)[::-1]
+
+    segments = [curve, _arrow_head(curve[-1], curve[-2], _ARROW_HEAD[0] * px, _ARROW_HEAD[1] * px)]
+    if both:
+        segments.append(_arrow_head(curve[0], curve[1], _ARROW_HEAD[0] * px, _ARROW_HEAD[1] * px))
+    inverse = trans.inverted()
+    return [inverse.transform(segment) for segment in segments]
+
+
+def _save_png(fig, output_path: str, dpi: int, pad_inches: float = 0.1,
+              optimize: bool = False, compress_level: int = 1) -> bool:
+    """
+    Write a PNG from a single Agg draw, cropped to the figure's tight bounds.
+    
+    Equivalent to savefig(bbox_inches='tight') as long as the drawing fits
+    on the figure, without its extra layout pass or Matplotlib's Pillow
+    wrapper. Deflate runs at `compress_level` (fast by default) unless
+    `optimize` asks for the smallest file.
+    
+    Args:
+        fig: Figure to save
+        output_path: Destination file
+        dpi: Image resolution in dots per inch
+        pad_inches: Padding kept around the tight bounds
+        optimize: Let Pillow search for the smallest encoding
+        compress_level: zlib level 0-9 used when not optimizing
+        
+    Returns:
+        False, without writing anything, if the drawing spills off the
+        figure and has to go through savefig instead
+    """
+    np = _numpy()
+    from PIL import Image
+
+    original_dpi = fig.dpi
+    fig.set_dpi(dpi)
+    try:
+        canvas = fig.canvas
+        canvas.draw()
+        bbox = fig.get_tightbbox(canvas.get_renderer())
+        width, height = fig.get_size_inches()
+        if bbox.x0 < 0 or bbox.y0 < 0 or bbox.x1 > width or bbox.y1 > height:
+            return False
+
+        left = int(max(bbox.x0 - pad_inches, 0) * dpi)
+        right = int(min(bbox.x1 + pad_inches, width) * dpi)
+        top = int((height - min(bbox.y1 + pad_inches, height)) * dpi)
+        bottom = int((height - max(bbox.y0 - pad_inches, 0)) * dpi)
+        pixels = np.asarray(canvas.buffer_rgba())[top:bottom, left:right]
+        png_options = {"optimize": True} if optimize else {"compress_level": compress_level}
+        Image.fromarray(pixels).save(output_path, "PNG", **png_options)
+        return True
+    finally:
+        fig.set_dpi(original_dpi)
+
+
+@contextmanager
+def _replacing(output_path: str) -> Iterator[str]:
+    """
+    Yield a temporary path to write the new contents of `output_path` to.
+    
+    The finished file is then moved over `output_path` in one step, so a
+    reader, such as a web server sending the previous version, only ever
+    sees a complete file; if writing fails the partial file is removed.
+    The temporary name keeps the extension, for writers that go by it.
+    """
+    base, ext = os.path.splitext(output_path)
+    tmp_path = f"{base}.{os.getpid()}-{threading.get_ident()}.tmp{ext}"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+def _file_stamp(path: str) -> Tuple[int, int]:
+    """Return (mtime, size) of a file, or (-1, -1) if it is gone."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return -1, -1
+    return stat.st_mtime_ns, stat.st_size
+
+
+class _RenderCache:
+    """
+    Files written by generate(), keyed by everything their contents depend on.
+    
+    Each key is the diagram's state key plus the render options. A file is
+    only reused while it still has the mtime and size it was written with,
+    so one deleted or edited on disk is rendered again.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, Tuple[str, int, int]] = {}
+
+    def get(self, key: Hashable) -> Optional[str]:
+        """Return the path rendered for `key` if the file is still untouched, else None."""
+        entry = self._entries.get(key)
+        if entry is not None and _file_stamp(entry[0]) == entry[1:]:
+            return entry[0]
+        return None
+
+    def put(self, key: Hashable, path: str) -> str:
+        """Record that `path` was just rendered for `key`, and return it."""
+        self._entries[key] = (path, *_file_stamp(path))
+        return path
+
+    def clear(self) -> None:
+        """Forget every rendered file, after the diagram changed."""
+        self._entries.clear()
+
+
+def _generate_all(diagram, output_formats: Sequence[str], dpi: int) -> List[str]:
+    """
+    Generate a diagram in several formats, one worker process per format.
+    
+    Each format runs its own independent Matplotlib pipeline, so they
+    are rendered in parallel from a pickled copy of the diagram.
+    
+    Args:
+        diagram: Any of the C1-C4 diagrams
+        output_formats: Image formats to generate
+        dpi: Image resolution in dots per inch
+        
+    Returns:
+        Paths to the generated diagram files, in the order of `output_formats`
+    """
+    output_formats = list(output_formats)
+    if len(output_formats) == 1:
+        return [diagram.generate(output_formats[0], dpi)]
+
+    with ProcessPoolExecutor(max_workers=len(output_formats) or None) as pool:
+        futures = [pool.submit(_generate_worker, diagram, fmt, dpi) for fmt in output_formats]
+        return [future.result() for future in futures]
+
+
+def _generate_worker(diagram, output_format: str, dpi: int) -> str:
+    """Process pool entry point for `_generate_all`; must live at module level to pickle."""
+    return diagram.generate(output_format, dpi)
+
+
+def _generate_many(cls, specs: Iterable[Union[str, bytes, Dict]], output_format: str, dpi: int,
+                   max_workers: Optional[int], default_name: str) -> List[str]:
+    """
+    Generate many diagrams of one class from JSON specs, spread over worker processes.
+    
+    Every diagram is drawn independently, so they render in parallel.
+    The specs are decoded up front and checked for output files they
+    would share: a spec without "output_filename" gets the class's
+    default one, and diagrams rendered at the same time would replace
+    each other's file. Such a batch raises ValueError before anything
+    is drawn.
+    
+    Args:
+        cls: Diagram class to build, one of C1-C4's
+        specs: JSON strings or dictionaries, as accepted by `cls.from_json`
+        output_format: Image format ('png', 'jpg', 'svg', 'pdf')
+        dpi: Image resolution in dots per inch
+        max_workers: Number of worker processes (default: one per CPU)
+        default_name: Diagram name for specs that do not set one
+        
+    Returns:
+        Paths to the generated diagram files, in the order of `specs`
+    """
+    specs = [(orjson.loads(spec) if orjson is not None else json.loads(spec))
+             if isinstance(spec, (str, bytes)) else spec for spec in specs]
+
+    default_filename = inspect.signature(cls).parameters["output_filename"].default
+    claimed = {}
+    for index, spec in enumerate(specs):
+        filename = spec.get("output_filename", default_filename)
+        if filename in claimed:
+            raise ValueError(f"specs[{claimed[filename]}] and specs[{index}] would both write "
+                             f"'{filename}.{output_format}'; give each its own \"output_filename\"")
+        claimed[filename] = index
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_generate_spec_worker, cls, spec, default_name, output_format, dpi)
+                   for spec in specs]
+        return [future.result() for future in futures]
+
+
+def _generate_spec_worker(cls, spec: Dict, default_name: str, output_format: str, dpi: int) -> str:
+    """Process pool entry point for `_generate_many`; must live at module level to pickle."""
+    options = {"output_filename": spec["output_filename"]} if "output_filename" in spec else {}
+    return cls(default_name, **options).from_json(spec).generate(output_format, dpi)
+
+
+def _unique(records: Iterable, seen: Set, key: Callable) -> Iterator:
+    """Yield the records whose key is not in `seen` yet, adding each new key to it."""
+    for record in records:
+        record_key = key(record)
+        if record_key not in seen:
+            seen.add(record_key)
+            yield record
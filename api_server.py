@@ -1,4 +1,13 @@
-from flask import Flask, jsonify
+import json
+import os
+import threading
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, the standard library is used without it
+    orjson = None
+
+from flask import Flask, Response, abort, send_file
 from C1 import C4ContextDiagram
 from C2 import C4ContainerDiagram
 from C3 import C4ComponentDiagram
@@ -6,29 +15,74 @@ from C4 import C4CodeDiagram
 
 app = Flask(__name__)
 
+# The routes never change these diagrams, so they are built once at import
+# and their responses serialised up front; rebuild the matching *_JSON
+# after changing a diagram
+C1_DIAGRAM = C4ContextDiagram("Online Shopping Application")
+# (populate it or load from a saved source)
+C2_DIAGRAM = C4ContainerDiagram("Online Shopping Application")
+# (populate it)
+C3_DIAGRAM = C4ComponentDiagram("API Application")
+# (populate it)
+C4_DIAGRAM = C4CodeDiagram("Order Management Controller")
+# (populate it)
+
+def _response_body(diagram) -> bytes:
+    """Serialise a diagram's JSON string the way jsonify() would."""
+    if orjson is not None:
+        return orjson.dumps(diagram.to_json())
+    return json.dumps(diagram.to_json()).encode()
+
+C1_JSON = _response_body(C1_DIAGRAM)
+C2_JSON = _response_body(C2_DIAGRAM)
+C3_JSON = _response_body(C3_DIAGRAM)
+C4_JSON = _response_body(C4_DIAGRAM)
+
 @app.route('/api/c1')
 def get_c1():
-    diagram = C4ContextDiagram("Online Shopping Application")
-    # (populate it or load from a saved source)
-    return jsonify(diagram.to_json())
+    return Response(C1_JSON, mimetype='application/json')
 
 @app.route('/api/c2')
 def get_c2():
-    diagram = C4ContainerDiagram("Online Shopping Application")
-    # (populate it)
-    return jsonify(diagram.to_json())
+    return Response(C2_JSON, mimetype='application/json')
 
 @app.route('/api/c3')
 def get_c3():
-    diagram = C4ComponentDiagram("API Application")
-    # (populate it)
-    return jsonify(diagram.to_json())
+    return Response(C3_JSON, mimetype='application/json')
 
 @app.route('/api/c4')
 def get_c4():
-    diagram = C4CodeDiagram("Order Management Controller")
-    # (populate it)
-    return jsonify(diagram.to_json())
+    return Response(C4_JSON, mimetype='application/json')
+
+_DIAGRAMS = {"c1": C1_DIAGRAM, "c2": C2_DIAGRAM, "c3": C3_DIAGRAM, "c4": C4_DIAGRAM}
+# Requests run on several threads; a diagram is rendered by one at a time,
+# as generate() writes its files and C4 draws its cached figure
+_DIAGRAM_LOCKS = {level: threading.Lock() for level in _DIAGRAMS}
+_IMAGE_MIMETYPES = {"png": "image/png", "svg": "image/svg+xml", "pdf": "application/pdf"}
+
+@app.route('/api/<level>.<output_format>')
+def get_image(level, output_format):
+    """
+    Serve a rendered diagram image.
+    
+    generate() keeps the file it wrote and only renders again once the
+    diagram or the file changed, so a repeat request is a plain file
+    send; the ETag is derived from the file, and a client revalidating
+    an unchanged image gets 304 without a body. A new render replaces
+    the file in one step, so a response never picks up a partial file.
+    """
+    diagram = _DIAGRAMS.get(level)
+    if diagram is None or output_format not in _IMAGE_MIMETYPES:
+        abort(404)
+    with _DIAGRAM_LOCKS[level]:
+        try:
+            output_path = diagram.generate(output_format)
+        except ValueError as e:  # nothing added to the diagram yet
+            abort(404, description=str(e))
+        # Opened before the lock is released, so the response sends this
+        # render even if another one replaces the file meanwhile
+        return send_file(os.path.abspath(output_path), mimetype=_IMAGE_MIMETYPES[output_format],
+                         conditional=True, etag=True)
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -1,117 +1,319 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, request, jsonify, render_template, send_file, send_from_directory
+from werkzeug.security import safe_join
+import gzip
+import hashlib
+import io
+import logging
+import mimetypes
+import multiprocessing
 import os
 import json
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from C1 import C4ContextDiagram
 from C2 import C4ContainerDiagram
 from C3 import C4ComponentDiagram
 from C4 import C4CodeDiagram
-from docx import Document
+from lxml import etree
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, the standard library is used without it
+    orjson = None
 
 app = Flask(__name__)
+_log = logging.getLogger(__name__)
 
 UPLOAD_FOLDER = 'uploads'
 DIAGRAM_FOLDER = 'diagrams_output'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(DIAGRAM_FOLDER, exist_ok=True)
 
-def parse_docx_to_c4_json(filepath):
-    doc = Document(filepath)
-    system_name = "Unnamed System"
-    users, external_systems, containers, components, relationships = [], [], [], [], []
-
-    print("--- Parsing DOCX ---")
-
-    # Extract system name (simplified)
-    for para in doc.paragraphs:
-        if para.style.name.startswith('Heading') and para.text.strip():
-            system_name = para.text.strip()
-            print("  Found system name:", system_name)
-            break
-        elif para.text.strip():
-            system_name = para.text.strip()
-            print("  Found system name (from first para):", system_name)
-            break
-
-    for table_idx, table in enumerate(doc.tables):
-        print(f"--- Table {table_idx + 1} ---")
-
-        # Attempt to identify table type by content (customize this!)
-        table_type = None
-        if table_idx == 0:  # Assuming the first table is users/systems
-            table_type = "users_systems"
-        elif table_idx == 1:  # Assuming the second table is containers
-            table_type = "containers"
-        elif table_idx == 2:  # Assuming the third table is components
-            table_type = "components"
-        elif table_idx == 3:  # Assuming the fourth table is relationships
-            table_type = "relationships"
+# Uploads are copied to disk in chunks of this size
+COPY_BUFSIZE = 1 << 20
+
+# Requests up to this size are parsed straight from memory; only larger
+# (or unsized, chunked) uploads are written to UPLOAD_FOLDER first
+IN_MEMORY_UPLOAD_LIMIT = 32 << 20
+
+# Diagram outputs that are text and shrink well; PNG and PDF are already
+# compressed and always go out as they are
+COMPRESSIBLE_EXTENSIONS = {'.svg', '.json', '.txt'}
+
+# Parsing a large DOCX is CPU-bound, so it runs in worker processes rather
+# than on the request thread. The workers are spawned, not forked: forking this
+# multi-threaded server could hand a child a lock held by another thread.
+# The pool is small, as every worker holds a whole document, and starts
+# its processes on first use, so importing this module (as the debug
+# reloader's watcher and the spawned workers themselves do) starts none
+DOCX_WORKERS = min(4, os.cpu_count() or 1)
+_docx_pool = ProcessPoolExecutor(max_workers=DOCX_WORKERS,
+                                 mp_context=multiprocessing.get_context("spawn"))
+
+# Compiled once and shared by every row of every table
+_W_NS = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
+# Cells and rows may sit inside a content control (<w:sdt>)
+_ROW_CELLS = etree.XPath('w:tc | w:sdt/w:sdtContent/w:tc', namespaces=_W_NS)
+_CELL_PARAGRAPHS = etree.XPath('.//w:p', namespaces=_W_NS)
+_TEXT_RUNS = etree.XPath('.//w:t/text()', namespaces=_W_NS)
+_TABLE_ROWS = etree.XPath('w:tr | w:sdt/w:sdtContent/w:tr', namespaces=_W_NS)
+_W_BODY = '{%s}body' % _W_NS['w']
+_W_P = '{%s}p' % _W_NS['w']
+_W_TBL = '{%s}tbl' % _W_NS['w']
+_W_VAL = '{%s}val' % _W_NS['w']
+_W_TC_PR = '{%s}tcPr' % _W_NS['w']
+_W_GRID_SPAN = '{%s}gridSpan' % _W_NS['w']
+_W_V_MERGE = '{%s}vMerge' % _W_NS['w']
+_GRID_BEFORE = '{%(w)s}trPr/{%(w)s}gridBefore' % _W_NS
+
+def _iter_docx_body(filepath):
+    """
+    Stream the top-level paragraphs and tables of a DOCX body, in document order.
+    
+    They are read straight from word/document.xml, and each element is
+    dropped once the caller moves on, so memory stays flat however long
+    the document is.
+    """
+    with zipfile.ZipFile(filepath) as z, z.open('word/document.xml') as f:
+        for _, el in etree.iterparse(f, events=('end',), tag=(_W_P, _W_TBL)):
+            parent = el.getparent()
+            if parent is None or parent.tag != _W_BODY:
+                continue  # inside a table; handled with the table
+            yield el
+            el.clear()
+            while el.getprevious() is not None:
+                del parent[0]
+
+def _is_docx(source):
+    """
+    Cheap check that an upload (path or bytes) is a DOCX at all.
+    
+    It must be a zip whose central directory, read from the end of the
+    file, lists the document part; nothing is decompressed.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    try:
+        with zipfile.ZipFile(source) as z:
+            z.getinfo('word/document.xml')
+    except (zipfile.BadZipFile, KeyError):
+        return False
+    return True
+
+def _cell_text(tc):
+    """Stripped text of a table cell (<w:tc>)."""
+    return "\n".join("".join(_TEXT_RUNS(p)) for p in _CELL_PARAGRAPHS(tc)).strip()
+
+def _table_texts(rows):
+    """
+    Yield the cell texts of every row of a table, read straight from the XML.
+    
+    They are laid out as python-docx's row.cells does: a cell spanning
+    several grid columns (gridSpan) is repeated for each, and a vertically
+    merged continuation cell (vMerge) takes the text of the cell above it.
+    """
+    above, above_start = [], 0  # previous row's texts and its first grid column
+    for tr in rows:
+        grid_before = tr.find(_GRID_BEFORE)
+        start = col = int(grid_before.get(_W_VAL, 0)) if grid_before is not None else 0
+        texts = []
+        for tc in _ROW_CELLS(tr):
+            # Cell properties (<w:tcPr>), when present, come first
+            span, continued = 1, False
+            if len(tc) and tc[0].tag == _W_TC_PR:
+                for prop in tc[0]:
+                    if prop.tag == _W_GRID_SPAN:
+                        span = int(prop.get(_W_VAL, 1))
+                    elif prop.tag == _W_V_MERGE:
+                        continued = prop.get(_W_VAL, "continue") == "continue"
+            if continued:
+                i = col - above_start
+                text = above[i] if 0 <= i < len(above) else ""
+            else:
+                text = _cell_text(tc)
+            texts.extend([text] * span)
+            col += span
+        above, above_start = texts, start
+        yield texts
+
+# Header columns each table type needs (lower-cased); a table is of the
+# first type whose columns it all has, and ignored if there is none
+TABLE_SCHEMAS = {
+    "users_systems": ("name", "type", "description"),
+    "containers": ("container name", "technology"),
+    "components": ("component name", "technology"),
+    "relationships": ("from", "to", "label"),
+}
 
+# Row handlers per table type: each gets the data rows' cell texts, the
+# index of every TABLE_SCHEMAS column in order, and the result to add to
+def _parse_users_systems(body, name_idx, type_idx, desc_idx, result):
+    add_user = result["users"].append
+    add_system = result["external_systems"].append
+    for cells in body:
+        kind = cells[type_idx].lower()
+        if kind == "person":
+            add_user({"name": cells[name_idx], "description": cells[desc_idx]})
+        elif kind == "system":
+            add_system({"name": cells[name_idx], "description": cells[desc_idx]})
+
+def _parse_containers(body, name_idx, tech_idx, result):
+    result["containers"].extend({"name": cells[name_idx], "technology": cells[tech_idx]}
+                                for cells in body)
+
+def _parse_components(body, name_idx, tech_idx, result):
+    result["components"].extend({"name": cells[name_idx], "technology": cells[tech_idx]}
+                                for cells in body)
+
+def _parse_relationships(body, from_idx, to_idx, label_idx, result):
+    result["relationships"].extend(
+        {"source": cells[from_idx], "target": cells[to_idx], "label": cells[label_idx]}
+        for cells in body)
+
+_TABLE_PARSERS = {
+    "users_systems": _parse_users_systems,
+    "containers": _parse_containers,
+    "components": _parse_components,
+    "relationships": _parse_relationships,
+}
+
+def parse_docx_to_c4_json(source):
+    """Parse a DOCX, given as a path or as the bytes of an upload kept in memory."""
+    system_name = None
+    result = {"system_name": None, "users": [], "external_systems": [],
+              "containers": [], "components": [], "relationships": []}
+
+    if isinstance(source, bytes):
+        _log.debug("Parsing DOCX from memory (%d bytes)", len(source))
+        source = io.BytesIO(source)
+    else:
+        _log.debug("Parsing DOCX %s", source)
+
+    table_idx = -1
+    for el in _iter_docx_body(source):
+        # Extract system name (simplified): the first paragraph with text
+        if el.tag == _W_P:
+            if system_name is None:
+                text = "".join(_TEXT_RUNS(el)).strip()
+                if text:
+                    system_name = text
+                    _log.debug("Found system name: %s", system_name)
+            continue
+
+        table_idx += 1
+        rows = _TABLE_ROWS(el)
+        if not rows:
+            continue
+        grid = _table_texts(rows)
+        headers = [text.lower() for text in next(grid)]
+
+        # Column of every header, the first one where a header repeats
+        hmap = {}
+        for i, header in enumerate(headers):
+            hmap.setdefault(header, i)
+
+        # Identify the table type by its header columns, wherever the
+        # table is in the document
+        table_type = next((name for name, columns in TABLE_SCHEMAS.items()
+                           if hmap.keys() >= set(columns)), None)
         if not table_type:
-            print("  Skipping table: Unable to determine type")
+            _log.debug("Table %d: skipped, unable to determine type from headers %s",
+                       table_idx + 1, headers)
             continue  # Skip if table type is unknown
+        _log.debug("Table %d (%s): %d rows, headers %s", table_idx + 1, table_type, len(rows) - 1, headers)
+
+        # Cell texts of every data row, read once; rows with fewer cells
+        # than the table type needs are ignored
+        columns = TABLE_SCHEMAS[table_type]
+        body = [cells for cells in grid if len(cells) >= len(columns)]
+        _TABLE_PARSERS[table_type](body, *(hmap[h] for h in columns), result)
 
-        headers = [cell.text.strip().lower() for cell in table.rows[0].cells]
-        print("  Table headers:", headers)
-
-        if table_type == "users_systems" and "name" in headers and "type" in headers and "description" in headers:
-            name_idx = headers.index("name")
-            type_idx = headers.index("type")
-            desc_idx = headers.index("description")
-            for row in table.rows[1:]:
-                cells = [cell.text.strip() for cell in row.cells]
-                if len(cells) >= 3:
-                    if cells[type_idx].lower() == "person":
-                        users.append({"name": cells[name_idx], "description": cells[desc_idx]})
-                        print("   Added user:", users[-1])
-                    elif cells[type_idx].lower() == "system":
-                        external_systems.append({"name": cells[name_idx], "description": cells[desc_idx]})
-                        print("   Added external system:", external_systems[-1])
-
-        elif table_type == "containers" and "container name" in headers and "technology" in headers:
-            name_idx = headers.index("container name")
-            tech_idx = headers.index("technology")
-            for row in table.rows[1:]:
-                cells = [cell.text.strip() for cell in row.cells]
-                if len(cells) >= 2:
-                    containers.append({"name": cells[name_idx], "technology": cells[tech_idx]})
-                    print("   Added container:", containers[-1])
-
-        elif table_type == "components" and "component name" in headers and "technology" in headers:
-            name_idx = headers.index("component name")
-            tech_idx = headers.index("technology")
-            for row in table.rows[1:]:
-                cells = [cell.text.strip() for cell in row.cells]
-                if len(cells) >= 2:
-                    components.append({"name": cells[name_idx], "technology": cells[tech_idx]})
-                    print("   Added component:", components[-1])
-
-        elif table_type == "relationships" and "from" in headers and "to" in headers and "label" in headers:
-            from_idx = headers.index("from")
-            to_idx = headers.index("to")
-            label_idx = headers.index("label")
-            for row in table.rows[1:]:
-                cells = [cell.text.strip() for cell in row.cells]
-                if len(cells) >= 3:
-                    relationships.append({"source": cells[from_idx], "target": cells[to_idx], "label": cells[label_idx]})
-                    print("   Added relationship:", relationships[-1])
-
-    print("--- Parsing Complete ---")
-    print("Extracted data:")
-    print("System Name:", system_name)
-    print("Users:", users)
-    print("External Systems:", external_systems)
-    print("Containers:", containers)
-    print("Components:", components)
-    print("Relationships:", relationships)
-
-    return {
-        "system_name": system_name,
-        "users": users,
-        "external_systems": external_systems,
-        "containers": containers,
-        "components": components,
-        "relationships": relationships
-    }
+    if system_name is None:
+        system_name = "Unnamed System"
+    result["system_name"] = system_name
+    _log.debug("Parsed %s: %d users, %d external systems, %d containers, %d components, "
+               "%d relationships", system_name, len(result["users"]), len(result["external_systems"]),
+               len(result["containers"]), len(result["components"]), len(result["relationships"]))
+
+    return result
+
+# Diagram JSON for an upload by content hash, file type and C4 level, the
+# least recently used dropped first; failures raise and, like unknown
+# levels (None), are not cached
+C4_JSON_CACHE_SIZE = 128
+_c4_json_cache = OrderedDict()
+_c4_json_lock = threading.Lock()
+
+def _cached_c4_json(key, ext, level, source):
+    cache_key = (key, ext, level)
+    with _c4_json_lock:
+        if cache_key in _c4_json_cache:
+            _c4_json_cache.move_to_end(cache_key)
+            return _c4_json_cache[cache_key]
+    c4_json = _build_c4_json(key, ext, level, source)
+    if c4_json is None:
+        return None
+    with _c4_json_lock:
+        _c4_json_cache[cache_key] = c4_json
+        if len(_c4_json_cache) > C4_JSON_CACHE_SIZE:
+            _c4_json_cache.popitem(last=False)
+    return c4_json
+
+def _build_c4_json(key, ext, level, source):
+    """
+    Diagram JSON for an upload, or None if the level is unknown.
+    
+    The source is the upload's path under UPLOAD_FOLDER or, for one kept
+    in memory, its bytes.
+    """
+    if ext == '.json':
+        if not isinstance(source, bytes):
+            with open(source, 'rb') as f:
+                source = f.read()
+        diagram_data = orjson.loads(source) if orjson is not None else json.loads(source)
+        _log.debug("File parsed as JSON")
+    elif isinstance(source, bytes):
+        # Already in memory and bounded by IN_MEMORY_UPLOAD_LIMIT: copying
+        # it into a worker would cost more than the streaming parse saves
+        diagram_data = parse_docx_to_c4_json(source)
+        _log.debug("File parsed as DOCX")
+    else:
+        # Large uploads are parsed in a worker, which is handed just the path
+        diagram_data = _docx_pool.submit(parse_docx_to_c4_json, source).result()
+        _log.debug("File parsed as DOCX")
+
+    if not diagram_data:
+        _log.warning("Failed to parse document %s", key + ext)
+        raise ValueError('Failed to parse document.')
+
+    diagram = None
+    output_filename = f"{level}_diagram"
+    _log.debug("Output filename: %s", output_filename)
+
+    if level == "c1":
+        diagram = C4ContextDiagram(system_name=diagram_data.get("system_name", "Unnamed System"), output_filename=output_filename)
+    elif level == "c2":
+        diagram = C4ContainerDiagram(system_name=diagram_data.get("system_name", "Unnamed System"), output_filename=output_filename)
+    elif level == "c3":
+        diagram = C4ComponentDiagram(container_name=diagram_data.get("container", "Unnamed Container"), output_filename=output_filename)
+    elif level == "c4":
+        diagram = C4CodeDiagram(component_name=diagram_data.get("component_name", "Unnamed Component"), output_filename=output_filename)
+
+    if diagram is None:
+        return None
+    diagram.from_json(diagram_data)
+    _log.debug("Diagram object created and populated")
+    return diagram.to_json()
+
+def _json_response(payload, status):
+    """jsonify() through orjson when it is there, keys sorted the same way."""
+    if orjson is None:
+        return jsonify(payload), status
+    return app.response_class(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS),
+                              status=status, mimetype='application/json')
 
 @app.route('/')
 def index():
@@ -120,64 +322,118 @@ def index():
 @app.route('/upload', methods=['POST'])
 def upload():
     try:
-        print("--- /upload route called ---")  # Entry point
         if 'file' not in request.files:
-            print("Error: No file uploaded.")
+            _log.warning("Upload without a file")
             return jsonify({'error': 'No file uploaded.'}), 400
         file = request.files['file']
         level = request.form.get('level')
-        print(f"File received: {file.filename}, Level: {level}")
-
-        filepath = os.path.join(UPLOAD_FOLDER, file.filename)
-        file.save(filepath)
-        print(f"File saved to: {filepath}")
+        _log.info("File received: %s, Level: %s", file.filename, level)
 
         if file.filename.endswith('.json'):
-            with open(filepath, 'r') as f:
-                diagram_data = json.load(f)
-            print("File parsed as JSON")
+            ext = '.json'
         elif file.filename.endswith('.docx'):
-            diagram_data = parse_docx_to_c4_json(filepath)
-            print("File parsed as DOCX")
+            ext = '.docx'
         else:
-            print("Error: Unsupported file type")
+            _log.warning("Unsupported file type: %s", file.filename)
             return jsonify({'error': 'Unsupported file type'}), 400
 
-        if not diagram_data:
-            print("Error: Failed to parse document")
-            return jsonify({'error': 'Failed to parse document.'}), 500
-
-        diagram = None
-        output_filename = f"{level}_diagram"
-        print(f"Output filename: {output_filename}")
-
-        if level == "c1":
-            diagram = C4ContextDiagram(system_name=diagram_data.get("system_name", "Unnamed System"), output_filename=output_filename)
-        elif level == "c2":
-            diagram = C4ContainerDiagram(system_name=diagram_data.get("system_name", "Unnamed System"), output_filename=output_filename)
-        elif level == "c3":
-            diagram = C4ComponentDiagram(container_name=diagram_data.get("container", "Unnamed Container"), output_filename=output_filename)
-        elif level == "c4":
-            diagram = C4CodeDiagram(component_name=diagram_data.get("component_name", "Unnamed Component"), output_filename=output_filename)
-
-        if diagram:
-            diagram.from_json(diagram_data)
-            print("Diagram object created and populated")
-            return jsonify({
-                'message': 'Diagram parsed successfully!',
-                'c4Data': diagram.to_json(),
-                'level': level
-            }), 200
+        # Results are cached under the hash of the upload's contents, so a
+        # file sent again is not parsed again
+        if request.content_length is not None and request.content_length <= IN_MEMORY_UPLOAD_LIMIT:
+            source = file.stream.read()
+            key = hashlib.blake2b(source, digest_size=16).hexdigest()
         else:
-            print("Error: Failed to create diagram object")
+            # Too big to hold: copy it to disk in large chunks, hashing it
+            # on the way, and keep it there under its hash
+            hasher = hashlib.blake2b(digest_size=16)
+            fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_FOLDER)
+            try:
+                with open(fd, 'wb', buffering=COPY_BUFSIZE) as out:
+                    while chunk := file.stream.read(COPY_BUFSIZE):
+                        hasher.update(chunk)
+                        out.write(chunk)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            key = hasher.hexdigest()
+            source = os.path.join(UPLOAD_FOLDER, key + ext)
+            if os.path.exists(source):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, source)
+                _log.debug("File saved to: %s", source)
+
+        if ext == '.docx' and not _is_docx(source):
+            _log.warning("Not a DOCX file: %s", file.filename)
+            if not isinstance(source, bytes):
+                os.remove(source)
+            return jsonify({'error': 'Not a valid DOCX file'}), 400
+
+        c4_json = _cached_c4_json(key, ext, level, source)
+        if c4_json is None:
+            _log.warning("Failed to create diagram object for level %s", level)
             return jsonify({'error': 'Failed to create diagram object'}), 500
 
+        return _json_response({
+            'message': 'Diagram parsed successfully!',
+            'c4Data': c4_json,
+            'level': level
+        }, 200)
+
     except Exception as e:
-        print(f"Server error: {e}")  # Print the full exception
+        _log.exception("Server error")
         return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+
+def _gzip_sidecar(path):
+    """
+    Gzipped copy kept beside a diagram output, or None if the output does not exist.
+    
+    The copy is written once, and again only when the original is newer.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    gz_path = path + '.gz'
+    try:
+        if os.stat(gz_path).st_mtime_ns >= mtime:
+            return gz_path
+    except FileNotFoundError:
+        pass
+
+    with open(path, 'rb') as f:
+        data = gzip.compress(f.read(), compresslevel=9, mtime=0)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with open(fd, 'wb') as out:
+            out.write(data)
+        os.replace(tmp_path, gz_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return gz_path
+
+
 @app.route('/diagrams_output/<path:filename>')
 def serve_diagram(filename):
-    return send_from_directory(DIAGRAM_FOLDER, filename)
+    if os.path.splitext(filename)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        response = send_from_directory(DIAGRAM_FOLDER, filename)
+    else:
+        # Text outputs go out gzipped to clients that accept it, from the
+        # sidecar, so each file is compressed once rather than per request
+        path = safe_join(DIAGRAM_FOLDER, filename)
+        gz_path = None
+        if path is not None and 'gzip' in request.accept_encodings:
+            gz_path = _gzip_sidecar(os.path.join(app.root_path, path))
+        if gz_path is None:
+            response = send_from_directory(DIAGRAM_FOLDER, filename)
+        else:
+            response = send_file(gz_path, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                                 conditional=True, etag=True)
+            response.content_encoding = 'gzip'
+        response.vary.add('Accept-Encoding')
+    return response
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+# The diagram modules and app.py are top-level modules of the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory, where generate() creates diagrams_output/."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,128 @@
+import io
+import json
+import os
+import zipfile
+
+import pytest
+from lxml import etree
+
+import app
+
+W_NS = app._W_NS['w']
+
+
+def _cell(text, span=None, vmerge=None):
+    props = ""
+    if span:
+        props += f'<w:gridSpan w:val="{span}"/>'
+    if vmerge:
+        props += '<w:vMerge/>' if vmerge == "continue" else f'<w:vMerge w:val="{vmerge}"/>'
+    props = f"<w:tcPr>{props}</w:tcPr>" if props else ""
+    return f"<w:tc>{props}<w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:tc>"
+
+
+def _table(*rows):
+    return "<w:tbl>" + "".join(f"<w:tr>{''.join(row)}</w:tr>" for row in rows) + "</w:tbl>"
+
+
+def _table_rows(*rows):
+    tbl = etree.fromstring(f'<w:document xmlns:w="{W_NS}"><w:body>{_table(*rows)}</w:body></w:document>')
+    return app._TABLE_ROWS(tbl[0][0])
+
+
+def _docx(title, *tables):
+    document = (f'<w:document xmlns:w="{W_NS}"><w:body>'
+                f'<w:p><w:r><w:t>{title}</w:t></w:r></w:p>{"".join(tables)}</w:body></w:document>')
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as z:
+        z.writestr("word/document.xml", document)
+    return buffer.getvalue()
+
+
+def test_table_texts_repeats_horizontally_merged_cells():
+    rows = _table_rows([_cell("Name"), _cell("Type"), _cell("Description")],
+                       [_cell("Alice", span=2), _cell("Shopper")])
+    assert list(app._table_texts(rows)) == [["Name", "Type", "Description"],
+                                            ["Alice", "Alice", "Shopper"]]
+
+
+def test_table_texts_fills_vertically_merged_cells_from_above():
+    rows = _table_rows([_cell("Name"), _cell("Type")],
+                       [_cell("Bob", vmerge="restart"), _cell("Person")],
+                       [_cell("", vmerge="continue"), _cell("System")],
+                       [_cell("", vmerge="continue"), _cell("Person")])
+    assert list(app._table_texts(rows))[1:] == [["Bob", "Person"], ["Bob", "System"],
+                                                ["Bob", "Person"]]
+
+
+def test_table_texts_follows_spans_into_merged_cells():
+    rows = _table_rows([_cell("A", span=2, vmerge="restart"), _cell("B", vmerge="restart")],
+                       [_cell("", span=2, vmerge="continue"), _cell("", vmerge="continue")])
+    assert list(app._table_texts(rows)) == [["A", "A", "B"], ["A", "A", "B"]]
+
+
+def test_table_texts_reads_cells_inside_content_controls():
+    rows = _table_rows([f"<w:sdt><w:sdtContent>{_cell('Wrapped')}</w:sdtContent></w:sdt>",
+                        _cell("Plain")])
+    assert list(app._table_texts(rows)) == [["Wrapped", "Plain"]]
+
+
+def test_parse_docx_reads_merged_users_table():
+    source = _docx("Online Shop", _table(
+        [_cell("Name"), _cell("Type"), _cell("Description")],
+        [_cell("Alice", vmerge="restart"), _cell("Person"), _cell("Buys things")],
+        [_cell("", vmerge="continue"), _cell("System"), _cell("Also a system")]))
+
+    result = app.parse_docx_to_c4_json(source)
+    assert result["system_name"] == "Online Shop"
+    assert result["users"] == [{"name": "Alice", "description": "Buys things"}]
+    assert result["external_systems"] == [{"name": "Alice", "description": "Also a system"}]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "UPLOAD_FOLDER", str(tmp_path))
+    return app.app.test_client()
+
+
+def _upload(client, data, filename, level="c1"):
+    return client.post("/upload", data={"file": (io.BytesIO(data), filename), "level": level},
+                       content_type="multipart/form-data")
+
+
+@pytest.mark.parametrize("data", [b"plain text, not a zip", _docx("x")[:-30]])
+def test_upload_rejects_non_docx(client, data):
+    response = _upload(client, data, "spec.docx")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Not a valid DOCX file"}
+
+
+def test_upload_rejects_zip_without_document(client):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as z:
+        z.writestr("readme.txt", "not a document")
+    response = _upload(client, buffer.getvalue(), "spec.docx")
+    assert response.status_code == 400
+
+
+def test_upload_removes_rejected_file_from_disk(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "IN_MEMORY_UPLOAD_LIMIT", 0)
+    response = _upload(client, b"plain text, not a zip", "spec.docx")
+    assert response.status_code == 400
+    assert os.listdir(tmp_path) == []
+
+
+def test_upload_rejects_unsupported_extension(client):
+    response = _upload(client, b"hello", "notes.txt")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Unsupported file type"}
+
+
+def test_upload_parses_docx(client):
+    source = _docx("Online Shop", _table([_cell("Name"), _cell("Type"), _cell("Description")],
+                                         [_cell("Alice"), _cell("Person"), _cell("Buys things")]))
+    response = _upload(client, source, "spec.docx")
+    assert response.status_code == 200
+    c4_data = json.loads(response.get_json()["c4Data"])
+    assert c4_data["system_name"] == "Online Shop"
+    assert [user["name"] for user in c4_data["users"]] == ["Alice"]
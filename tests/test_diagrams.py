@@ -0,0 +1,188 @@
+import json
+import os
+
+import pytest
+
+from C1 import C4ContextDiagram, DiagramRenderer, User
+from C2 import C4ContainerDiagram
+from C3 import C4ComponentDiagram
+from C4 import C4CodeDiagram, _check_spec
+
+
+def _context_diagram():
+    diagram = C4ContextDiagram("Online Shop", output_filename="shop_context")
+    diagram.add_user("Customer", "Buys things", "Shopper")
+    diagram.add_external_system("Payments", "Card processing", "HTTPS")
+    diagram.add_relationship("Customer", "Payments", "Pays with", bidirectional=True)
+    return diagram
+
+
+def _container_diagram():
+    diagram = C4ContainerDiagram("Online Shop", output_filename="shop_containers")
+    diagram.add_container("Web App", "React", "Storefront", "Web")
+    diagram.add_container("Orders DB", "PostgreSQL", container_type="Database")
+    diagram.add_relationship("Web App", "Orders DB", "Reads orders", "SQL")
+    return diagram
+
+
+def _component_diagram():
+    diagram = C4ComponentDiagram("Order Service", output_filename="order_components")
+    diagram.add_component("Controller", "Spring MVC", "Handles requests", "Controller", "REST")
+    diagram.add_component("Publisher", "Kafka", component_type="Utility")
+    diagram.add_relationship("Controller", "Publisher", "Emits events", "Kafka", async_comm=True)
+    return diagram
+
+
+def _code_diagram():
+    diagram = C4CodeDiagram("Orders", output_filename="order_code")
+    diagram.add_class("Order", "An order", ["id: int"], ["total()"], "Entity")
+    diagram.add_class("Repository", is_interface=True)
+    diagram.add_class("SqlRepository", class_type="Repository")
+    diagram.add_association("Order", "SqlRepository", "stored by", "1..*", aggregation=True)
+    diagram.add_interface_implementation("SqlRepository", "Repository")
+    diagram.add_inheritance("SqlRepository", "Repository")
+    return diagram
+
+
+@pytest.mark.parametrize("build, name", [
+    (_context_diagram, "Online Shop"),
+    (_container_diagram, "Online Shop"),
+    (_component_diagram, "Order Service"),
+    (_code_diagram, "Orders"),
+])
+def test_json_round_trip(build, name):
+    diagram = build()
+    data = diagram.to_json()
+
+    for source in (data, data.encode(), json.loads(data)):
+        copy = type(diagram)("Other").from_json(source)
+        assert copy.to_json() == data
+    assert json.loads(diagram.to_json(indent=4)) == json.loads(data)
+    assert name in data
+
+
+def test_to_json_sees_direct_list_changes():
+    diagram = _context_diagram()
+    before = diagram.to_json()
+    diagram.users.append(User("Admin", None, None))
+    assert diagram.to_json() != before
+    assert "Admin" in diagram.to_json()
+
+
+@pytest.mark.parametrize("build", [_context_diagram, _container_diagram,
+                                   _component_diagram, _code_diagram])
+def test_render_cache_reuses_untouched_file(workdir, build, monkeypatch):
+    diagram = build()
+    path = diagram.generate("svg")
+
+    def fail(*args):
+        raise AssertionError("rendered again")
+
+    monkeypatch.setattr(diagram, "_emit_svg", fail)
+    assert diagram.generate("svg") == path
+
+
+def test_render_cache_rewrites_touched_file(workdir):
+    diagram = _container_diagram()
+    path = diagram.generate("svg")
+    with open(path) as f:
+        before = f.read()
+    with open(path, "w") as f:
+        f.write("edited")
+
+    assert diagram.generate("svg") == path
+    with open(path) as f:
+        assert f.read() == before
+
+
+@pytest.mark.parametrize("build, change", [
+    (_context_diagram, lambda d: d.add_user("Admin")),
+    (_container_diagram, lambda d: d.add_container("Cache", "Redis")),
+    (_component_diagram, lambda d: d.add_relationship("Publisher", "Controller", "Acks")),
+    (_code_diagram, lambda d: d.add_class("Invoice")),
+])
+def test_render_cache_invalidated_by_changes(workdir, build, change):
+    diagram = build()
+    path = diagram.generate("svg")
+    with open(path) as f:
+        before = f.read()
+
+    change(diagram)
+    assert diagram.generate("svg") == path
+    with open(path) as f:
+        assert f.read() != before
+
+
+def test_render_cache_rewrites_missing_file(workdir):
+    diagram = _code_diagram()
+    path = diagram.generate("png")
+    os.remove(path)
+
+    assert diagram.generate("png") == path
+    assert os.path.exists(path)
+
+
+def test_render_cache_keyed_by_options(workdir):
+    diagram = _component_diagram()
+    path = diagram.generate("png")
+    size = os.path.getsize(path)
+
+    diagram.generate("png", high_res=True)
+    assert os.path.getsize(path) > size
+
+
+@pytest.mark.parametrize("spec", [
+    [],
+    {"component_name": 3},
+    {"classes": {"name": "A"}},
+    {"classes": ["A"]},
+    {"classes": [{"description": "no name"}]},
+    {"classes": [{"name": ""}]},
+    {"associations": [{"class1": "A"}]},
+    {"inheritances": [{"subclass": "A", "superclass": 1}]},
+    {"interfaces": [{"implementor": None, "interface": "I"}]},
+])
+def test_check_spec_rejects_malformed_specs(spec):
+    with pytest.raises(ValueError):
+        _check_spec(spec)
+
+
+def test_code_diagram_rejected_spec_loads_nothing():
+    diagram = C4CodeDiagram("Orders")
+    spec = {"classes": [{"name": "A"}], "associations": [{"class1": "A", "class2": ""}]}
+    with pytest.raises(ValueError):
+        diagram.from_json(spec)
+    assert diagram.classes == [] and diagram.associations == []
+
+
+def test_check_spec_fills_in_defaults():
+    spec = _check_spec({"classes": [{"name": "A"}]})
+    assert spec["classes"][0]["type"] == "Class"
+    assert spec["associations"] == []
+
+
+def test_code_diagram_batch_defers_layout_invalidation():
+    diagram = C4CodeDiagram("Orders")
+    diagram.add_class("A")
+    layout = diagram._calculate_positions()
+    with diagram.batch():
+        diagram.add_class("B")
+        assert diagram._positions_cache is layout
+        assert set(diagram._calculate_positions()) == {"A", "B"}
+    assert set(diagram._calculate_positions()) == {"A", "B"}
+
+
+@pytest.mark.parametrize("cls", [C4ContextDiagram, C4ContainerDiagram, C4ComponentDiagram])
+def test_generate_many_rejects_shared_output_files(cls):
+    with pytest.raises(ValueError, match="output_filename"):
+        cls.generate_many([{}, {}])
+    with pytest.raises(ValueError, match="output_filename"):
+        cls.generate_many([{"output_filename": "same"}, json.dumps({"output_filename": "same"})])
+
+
+def test_closed_renderer_refuses_to_render(workdir):
+    diagram = _context_diagram()
+    with DiagramRenderer() as renderer:
+        assert os.path.exists(renderer.render(diagram, "png"))
+    with pytest.raises(RuntimeError):
+        renderer.render(diagram, "png")